@@ -1,7 +1,9 @@
 import json
 import dash
 from dash import Dash, html, dcc, callback
-from dash.dependencies import Output, Input
+from dash.dependencies import Output, Input, State, ClientsideFunction
+from dash.exceptions import PreventUpdate, MissingCallbackContextException
+import flask
 import plotly.graph_objects as go
 from dash_extensions import Lottie       # pip install dash-extensions
 import dash_bootstrap_components as dbc  # pip install dash-bootstrap-components
@@ -10,6 +12,14 @@ import pandas as pd                      # pip install pandas
 from datetime import date
 import numpy as np
 import base64
+import os
+import math
+import sqlite3
+from figure_cache import FigureCache, SQLiteFigureStore
+import metrics
+import figure_dicts
+import search
+import timeline
 
 try:
     import fig_layout
@@ -21,6 +31,8 @@ except ImportError as e:
         toatl_funding = "1,234" 
         toatl_number_unicorn = "567"  
         total_valuation = "890"
+        dataset_version = None
+        version = None
         fig2 = go.Figure()
         fig3 = go.Figure()
         fig4 = go.Figure()
@@ -29,6 +41,92 @@ except ImportError as e:
                         'Founded Year': [2010, 2015, 2020],
                         'Country': ['USA', 'China', 'UK'],
                         'Select Investors': ['Investor A, Investor B', 'Investor C', 'Investor D']})
+
+        year_bounds = (2010, 2020)
+
+        @staticmethod
+        def top_investors(country=None, n=10, filters=None, data=None):
+            return pd.Series(dtype='int64')
+
+        @staticmethod
+        def founded_year_counts(industry, filters=None, data=None):
+            return pd.Series(dtype='int64')
+
+        @staticmethod
+        def create_industry_chart(filters=None, data=None, offset=0):
+            return go.Figure()
+
+        @staticmethod
+        def restrict_years(filters, low, high):
+            return dict(filters or {}, **{'Founded Year': (low, high)}) if low <= high else None
+
+        @staticmethod
+        def bin_series(series, max_points=None):
+            return series, 1
+
+        @staticmethod
+        def client_payload(filters=None, data=None):
+            return {}
+
+        @staticmethod
+        def build_figure(name, filters=None, data=None):
+            return go.Figure()
+
+        @staticmethod
+        def make_filters(countries=None, industries=None, stages=None, years=None, data=None):
+            return None
+
+        @staticmethod
+        def kpi_totals(filters=None, data=None):
+            return DummyWrangle.total_valuation, DummyWrangle.toatl_number_unicorn, DummyWrangle.toatl_funding
+
+        @staticmethod
+        def filter_options(data=None):
+            return {}
+
+        @staticmethod
+        def industries(data=None):
+            return DummyWrangle.df.Industry.unique().tolist()
+
+        @staticmethod
+        def apply_update(records):
+            raise ValueError("no dataset is loaded")
+
+        @staticmethod
+        def current():
+            return DummyWrangle
+
+        @staticmethod
+        def start_reloader(interval=10):
+            return None
+
+        @staticmethod
+        def warm_snapshot(data=None):
+            return None
+
+        @staticmethod
+        def co_investors(investor, n=10, filters=None, data=None):
+            return pd.Series(dtype='int64')
+
+        @staticmethod
+        def search_names(text, limit=10, data=None):
+            return []
+
+        @staticmethod
+        def search_target(kind, label, row=-1, data=None):
+            return {'kind': kind, 'label': label}
+
+        @staticmethod
+        def investor_clusters(filters=None, min_shared=2, min_size=2, limit=None, data=None):
+            return []
+
+        @staticmethod
+        def investor_links_unavailable(data=None):
+            return "not available without data"
+
+        @staticmethod
+        def timeline_for(filters=None, data=None):
+            return timeline.build_timeline(None)
     class DummyFigLayout:
         my_figlayout = {}
     
@@ -36,207 +134,854 @@ except ImportError as e:
     fig_layout = DummyFigLayout()
 
 
+# figures are shared between workers through a SQLite file; set FIGURE_CACHE_PATH="" to disable
+figure_cache_path = os.environ.get("FIGURE_CACHE_PATH", os.path.join(".cache", "figures.sqlite"))
+figure_store = None
+if figure_cache_path:
+    try:
+        figure_store = SQLiteFigureStore(
+            figure_cache_path,
+            ttl=int(os.environ.get("FIGURE_CACHE_TTL", 3600)),
+            max_entries=int(os.environ.get("FIGURE_CACHE_ENTRIES", 2000))
+        )
+    except sqlite3.Error as e:
+        print(f"Warning: shared figure cache disabled: {e}")
+figure_cache = FigureCache(
+    maxsize=256,
+    backend=figure_store,
+    listener=metrics.record_cache if metrics.ENABLED else None
+)
+
+# extra stores of the clientside mode, appended to every page layout
+client_stores = []
+
+# UNICORN_CLIENTSIDE=1 ships the chart aggregates to the browser once per filter change and draws
+# the industry-years and country-investors charts there (assets/clientside.js)
+CLIENTSIDE = os.environ.get("UNICORN_CLIENTSIDE", "") not in ("", "0")
+
+# pick up edits to the source CSV without a restart; UNICORN_RELOAD_INTERVAL=0 disables it
+reload_interval = float(os.environ.get("UNICORN_RELOAD_INTERVAL", 10))
+if reload_interval > 0:
+    wrangle.start_reloader(reload_interval)
+
+# build the startup figures in parallel now rather than on the first request
+wrangle.warm_snapshot()
+
 app = dash.Dash(
     __name__,
     external_stylesheets=[dbc.themes.CYBORG],  
     title="Billion Dollar Startups Dashboard"
 )
-app.layout = dbc.Container([
-    dbc.Col([
-        dbc.Card([
-            dbc.CardBody([
-                html.H1(
-                    "Startups Companies",
-                    className="custom-heading",
-                    style={'fontSize': '4.5rem','fontWeight':'bold'}
-                )
-            ], className="d-flex align-items-center justify-content-center h-100")
-        ], className="compound-card", style={"height": "100px"}),
-    ], width=12),
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader(
-                    html.Div('Total Funding', style={'fontSize': '1.5rem','fontWeight':'bold'})
-                ),
-                dbc.CardBody([
-                    html.Div(
-                        f"{wrangle.toatl_funding} $M",
-                        style={'fontSize': '2.5rem','fontWeight':'bold'}
-                    )
-                ])
-            ], className="compound-card", id="banner_funding"),
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader(
-                    html.Div('Total Number Unicorn', style={'fontSize': '1.5rem','fontWeight':'bold'})
-                ),
-                dbc.CardBody([
-                    html.Div(
-                        f"#{wrangle.toatl_number_unicorn}",
-                        style={'fontSize': '2.5rem','fontWeight':'bold'}
-                    )
-                ])
-            ], className="compound-card", id="banner_unicorn"),
-        ], width=4),
+
+def serve_layout():
+    """Page layout, built per page load so the slider, options and KPIs match the current snapshot"""
+    filter_options = wrangle.filter_options()
+    return dbc.Container([
         dbc.Col([
             dbc.Card([
-                dbc.CardHeader(
-                    html.Div('Total Valuation', style={'fontSize': '1.5rem','fontWeight':'bold'})
-                ),
                 dbc.CardBody([
-                    html.Div(
-                        f"~ {wrangle.total_valuation} $B",
-                        style={'fontSize': '2.5rem','fontWeight':'bold'}
+                    html.H1(
+                        "Startups Companies",
+                        className="custom-heading",
+                        style={'fontSize': '4.5rem','fontWeight':'bold'}
                     )
-                ])
-            ], className="compound-card", id="banner_valuation"),
-        ], width=4),
-    ], className='mb-3'),
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    dcc.Graph(id="figurefour", figure=wrangle.fig4)
-                ])
-            ], className="compound-card"),
-        ], width=6),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    dcc.Graph(id="next-graph", figure=wrangle.fig2)
-                ])
-            ], className="compound-card"),
-        ], width=6),
-    ], className="mb-3"),
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    dcc.Dropdown(
-                        options=[{'label': industry, 'value': industry} 
-                                for industry in wrangle.df.Industry.unique().tolist()],
-                        value="Fintech", 
-                        id='demo-dropdown'
+                ], className="d-flex align-items-center justify-content-center h-100")
+            ], className="compound-card", style={"height": "100px"}),
+        ], width=12),
+        dbc.Row([
+            dbc.Col([
+                dcc.Dropdown(
+                    options=[],
+                    placeholder='Search companies, cities and investors',
+                    clearable=True,
+                    id='search'
+                )
+            ], width=12),
+        ], className="mb-2"),
+        dbc.Row([
+            dbc.Col([
+                dcc.Dropdown(
+                    options=[{'label': country, 'value': country} for country in filter_options.get('Country', [])],
+                    multi=True,
+                    placeholder='All countries',
+                    id='filter-country'
+                )
+            ], width=3),
+            dbc.Col([
+                dcc.Dropdown(
+                    options=[{'label': industry, 'value': industry} for industry in filter_options.get('Industry', [])],
+                    multi=True,
+                    placeholder='All industries',
+                    id='filter-industry'
+                )
+            ], width=3),
+            dbc.Col([
+                dcc.Dropdown(
+                    options=[{'label': stage, 'value': stage} for stage in filter_options.get('Financial Stage', [])],
+                    multi=True,
+                    placeholder='All financial stages',
+                    id='filter-stage'
+                )
+            ], width=3),
+            dbc.Col([
+                dcc.RangeSlider(
+                    min=wrangle.year_bounds[0],
+                    max=wrangle.year_bounds[1],
+                    step=1,
+                    value=list(wrangle.year_bounds),
+                    marks=None,
+                    tooltip={'placement': 'bottom', 'always_visible': False},
+                    id='filter-years'
+                )
+            ], width=3),
+        ], className='my-3'),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(
+                        html.Div('Total Funding', style={'fontSize': '1.5rem','fontWeight':'bold'})
                     ),
-                    dcc.Graph(id="figurethree", figure={})
-                ])
-            ], className="compound-card"),
-        ], width=6),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    dcc.Graph(id="figureone", figure=wrangle.fig5)
-                ])
-            ], className="compound-card"),
-        ], width=6),
-    ], className="mb-3"),
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    dcc.Graph(id="figureFive", figure=wrangle.fig3)
-                ])
-            ], className="compound-card"),
-        ], width=6, className="mx-auto"),  
-    ]),
-], fluid=True)
+                    dbc.CardBody([
+                        html.Div(
+                            f"{wrangle.toatl_funding} $M",
+                            style={'fontSize': '2.5rem','fontWeight':'bold'},
+                            id="kpi_funding"
+                        )
+                    ])
+                ], className="compound-card", id="banner_funding"),
+            ], width=4),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(
+                        html.Div('Total Number Unicorn', style={'fontSize': '1.5rem','fontWeight':'bold'})
+                    ),
+                    dbc.CardBody([
+                        html.Div(
+                            f"#{wrangle.toatl_number_unicorn}",
+                            style={'fontSize': '2.5rem','fontWeight':'bold'},
+                            id="kpi_unicorn"
+                        )
+                    ])
+                ], className="compound-card", id="banner_unicorn"),
+            ], width=4),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(
+                        html.Div('Total Valuation', style={'fontSize': '1.5rem','fontWeight':'bold'})
+                    ),
+                    dbc.CardBody([
+                        html.Div(
+                            f"~ {wrangle.total_valuation} $B",
+                            style={'fontSize': '2.5rem','fontWeight':'bold'},
+                            id="kpi_valuation"
+                        )
+                    ])
+                ], className="compound-card", id="banner_valuation"),
+            ], width=4),
+        ], className='mb-3'),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dcc.Graph(id="figurefour", figure={})
+                    ])
+                ], className="compound-card"),
+            ], width=6),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dcc.Graph(id="next-graph", figure={})
+                    ])
+                ], className="compound-card"),
+            ], width=6),
+        ], className="mb-3"),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dcc.Dropdown(
+                            options=[{'label': industry, 'value': industry} 
+                                    for industry in wrangle.industries()],
+                            value="Fintech", 
+                            id='demo-dropdown'
+                        ),
+                        dcc.Graph(id="figurethree", figure={})
+                    ])
+                ], className="compound-card"),
+            ], width=6),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dcc.Graph(id="figureone", figure={})
+                    ])
+                ], className="compound-card"),
+            ], width=6),
+        ], className="mb-3"),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dcc.Graph(id="figureFive", figure={})
+                    ])
+                ], className="compound-card"),
+            ], width=6),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dcc.Graph(id="co-investors", figure={})
+                    ])
+                ], className="compound-card"),
+            ], width=6),
+        ], className="mb-3"),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dcc.Graph(id="timeline", figure={})
+                    ])
+                ], className="compound-card"),
+            ], width=6),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dcc.Graph(id="time-to-unicorn", figure={})
+                    ])
+                ], className="compound-card"),
+            ], width=6),
+        ], className="mb-3"),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dcc.Graph(id="investor-clusters", figure={})
+                    ])
+                ], className="compound-card"),
+            ], width=12),
+        ]),
+        dcc.Store(id='dataset-version', data=wrangle.dataset_version),
+        dcc.Interval(id='version-poll', interval=5000),
+        *client_stores,
+    ], fluid=True)
+
+app.layout = serve_layout
+
+STATIC_FIGURES = {
+    'figurefour': 'world_map',
+    'figureFive': 'top_companies'
+}
+
+FILTER_INPUTS = [
+    Input('filter-country', 'value'),
+    Input('filter-industry', 'value'),
+    Input('filter-stage', 'value'),
+    Input('filter-years', 'value')
+]
+
+# dataset-version changes after an incremental update, refreshing every chart
+DATA_INPUTS = FILTER_INPUTS + [Input('dataset-version', 'data')]
+SEARCH_INPUT = Input('search', 'value')
+HIGHLIGHT_COLOR = '#FFD166'
+
+def filters_key(filters):
+    return tuple(filters.items()) if filters else None
+
+def search_option(kind, label, row, query=''):
+    """Dropdown option for a search match, with the typed part in bold"""
+    before, matched, after = search.highlight(label, query)
+    return {
+        'label': html.Span([before, html.B(matched), after, html.Small(f"  {kind}", className="text-muted")]),
+        'value': json.dumps([kind, label, row]),
+        'search': str(label)
+    }
+
+def selection_target(selection, data=None):
+    """Highlight target of the search dropdown value, or None"""
+    if not selection:
+        return None
+    try:
+        kind, label, row = json.loads(selection)
+    except (TypeError, ValueError):
+        return None
+    return wrangle.search_target(kind, label, row, data=data)
+
+def _highlight_bars(fig, label):
+    # recolor the bar named label, copying only what changes so cached figures stay intact
+    traces = []
+    for trace in fig['data']:
+        names = list(trace.get('y', [])) if trace.get('type') == 'bar' else []
+        if label in names:
+            base = trace.get('marker', {}).get('color', '#3DED97')
+            colors = [HIGHLIGHT_COLOR if name == label else base for name in names]
+            trace = dict(trace, marker=dict(trace.get('marker', {}), color=colors))
+        traces.append(trace)
+    return dict(fig, data=traces)
+
+def highlight_figure(fig, target, chart):
+    """Copy of a cached figure with the search target marked on it"""
+    if not target:
+        return fig
+    if hasattr(fig, 'to_plotly_json'):
+        fig = fig.to_plotly_json()
+    if chart == 'industry' and 'Industry' in target:
+        return _highlight_bars(fig, target['Industry'])
+    if chart == 'country_investors' and 'Investor' in target:
+        return _highlight_bars(fig, target['Investor'])
+    if chart == 'world_map' and target.get('iso_code'):
+        return dict(fig, data=list(fig['data']) + [{
+            'type': 'choropleth',
+            'locations': [target['iso_code']],
+            'z': [1],
+            'colorscale': [[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
+            'showscale': False,
+            'marker': {'line': {'color': HIGHLIGHT_COLOR, 'width': 3}},
+            'hoverinfo': 'skip'
+        }])
+    if chart == 'top_companies' and 'Valuation ($B)' in target and 'Total Raised(M)' in target:
+        return dict(fig, data=list(fig['data']) + [{
+            'type': 'scatter',
+            'mode': 'markers+text',
+            'x': [target['Valuation ($B)']],
+            'y': [target['Total Raised(M)']],
+            'text': [target['label']],
+            'textposition': 'top center',
+            'marker': {'symbol': 'star', 'size': 18, 'color': HIGHLIGHT_COLOR},
+            'name': target['label'],
+            'showlegend': False
+        }])
+    return fig
 
 @app.callback(
-    Output("figurethree", "figure"),
-    Input('demo-dropdown', 'value')
-)
-def update_output(value):
-    df = wrangle.df.copy(deep=True)
-    fig1 = go.Figure()
-    fig1.update_layout(
-        title='Select an industry from dropdown',
-        xaxis_title='Year',
-        yaxis_title='Count'
+    Output('dataset-version', 'data'),
+    Input('version-poll', 'n_intervals'),
+    State('dataset-version', 'data')
+)
+@metrics.instrument('poll_version')
+def poll_version(_, current):
+    version = wrangle.current().version
+    if current == version:
+        raise PreventUpdate
+    return version
+
+@app.callback(
+    Output('filter-country', 'options'),
+    Output('filter-industry', 'options'),
+    Output('filter-stage', 'options'),
+    Output('demo-dropdown', 'options'),
+    Output('filter-years', 'min'),
+    Output('filter-years', 'max'),
+    Output('filter-years', 'value'),
+    Input('dataset-version', 'data'),
+    State('filter-years', 'min'),
+    State('filter-years', 'max'),
+    State('filter-years', 'value'),
+    prevent_initial_call=True
+)
+@metrics.instrument('update_options', serialize=True)
+def update_options(_, low=None, high=None, years=None):
+    data = wrangle.current()
+    options = wrangle.filter_options(data)
+    bounds = data.year_bounds
+    # an untouched slider follows the new bounds, a narrowed one keeps its range within them
+    if not years or list(years) == [low, high]:
+        years = list(bounds)
+    else:
+        years = [min(max(years[0], bounds[0]), bounds[1]), max(min(years[1], bounds[1]), bounds[0])]
+    return (
+        [{'label': country, 'value': country} for country in options.get('Country', [])],
+        [{'label': industry, 'value': industry} for industry in options.get('Industry', [])],
+        [{'label': stage, 'value': stage} for stage in options.get('Financial Stage', [])],
+        [{'label': industry, 'value': industry} for industry in wrangle.industries(data)],
+        bounds[0],
+        bounds[1],
+        years
     )
-    if value and value in df['Industry'].values:
-        df_filtered = df[df['Industry'] == value]
-        df_with_fyear = df_filtered[~df_filtered['Founded Year'].isna()]
-        
-        if not df_with_fyear.empty:
-            num_by_founded_year = df_with_fyear["Founded Year"].value_counts().reset_index()
-            num_by_founded_year.columns = ["year", "count"]
-            num_by_founded_year["year"] = num_by_founded_year["year"].astype(int)
-            num_by_founded_year = num_by_founded_year[num_by_founded_year["year"] >= 1990]
-            num_by_founded_year.sort_values(by=["year"], inplace=True)
-            fig1 = go.Figure()
-            fig1.add_trace(go.Scatter(
-                x=num_by_founded_year["year"],
-                y=num_by_founded_year["count"],
-                fillcolor='rgba(178, 211, 194,0.11)', 
-                fill='tonexty',
-                mode='lines+markers',
-                line_color='#3DED97',
-                name=f'{value} Companies'
-            ))
-            
-            fig1.update_layout(
-                title=f'Companies Founded by Year - {value}',
-                xaxis_title='Founded Year',
-                yaxis_title='Number of Companies'
-            )
-            if hasattr(fig_layout, 'my_figlayout'):
-                fig1.update_layout(fig_layout.my_figlayout)
-    
-    return fig1
+
+@app.server.route('/api/rows', methods=['POST'])
+def post_rows():
+    """Append or replace rows (raw CSV columns) without restarting the app"""
+    token = os.environ.get("UNICORN_UPDATE_TOKEN")
+    if not token or flask.request.headers.get('X-Update-Token') != token:
+        return flask.jsonify(error='updates are disabled or the token is wrong'), 403
+    records = flask.request.get_json(silent=True)
+    if not isinstance(records, list) or not records:
+        return flask.jsonify(error='expected a JSON list of rows'), 400
+    try:
+        version = wrangle.apply_update(records)
+    except (KeyError, ValueError, TypeError) as e:
+        return flask.jsonify(error=str(e)), 400
+    return flask.jsonify(version=version, rows=len(records))
+
+@app.server.route('/metrics')
+def metrics_endpoint():
+    """Callback and builder timings, payload sizes and cache outcomes in Prometheus text format"""
+    if not metrics.ENABLED:
+        return flask.Response("# metrics are disabled, set UNICORN_METRICS=1\n", mimetype='text/plain')
+    return flask.Response(metrics.expose(), mimetype='text/plain; version=0.0.4')
+
+if getattr(wrangle, 'READ_ONLY_CHECKS', False):
+    @app.server.after_request
+    def check_read_only(response):
+        # debug guard: callbacks share the snapshot, fail loudly if one changed it
+        wrangle.check_read_only()
+        return response
+
+def register_static_figure(graph_id, name):
+    # fires on page load and on every cross-filter change; Dash sends one request
+    # per graph so they build concurrently
+    @app.callback(
+        Output(graph_id, 'figure'),
+        Input(graph_id, 'id'),
+        *DATA_INPUTS,
+        SEARCH_INPUT
+    )
+    @metrics.instrument(f'load_figure:{name}', serialize=True)
+    def load_figure(_, countries, industries, stages, years, _version, selection=None):
+        data = wrangle.current()
+        filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+        fig = figure_cache.get_or_build(
+            ('figure', name, filters_key(filters)),
+            data.version,
+            lambda: wrangle.build_figure(name, filters, data)
+        )
+        return highlight_figure(fig, selection_target(selection, data), name)
+
+for graph_id, name in STATIC_FIGURES.items():
+    register_static_figure(graph_id, name)
+
 @app.callback(
-    Output('next-graph', 'figure'),
-    Input('figurefour', 'hoverData')
+    Output('figureone', 'figure'),
+    Input('figureone', 'clickData'),
+    *DATA_INPUTS,
+    SEARCH_INPUT
 )
-def update_graph(option_slctd):
-    df = wrangle.df.copy(deep=True)
-    
-    title = "Top 10 Investors"
-    
-    if option_slctd:
+@metrics.instrument('update_industry_chart', serialize=True)
+def update_industry_chart(click_data, countries=None, industries=None, stages=None, years=None, _version=None,
+                          selection=None):
+    # clicking the "Other" bar expands the industries it folds, any other bar goes back to the top
+    data = wrangle.current()
+    filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+    offset = 0
+    if click_data:
         try:
-            selected_country = option_slctd['points'][0]['hovertext']
-            filtered_df = df[df['Country'] == selected_country]
-            title = f"Top Investors in {selected_country}"
-        except (KeyError, IndexError):
-            filtered_df = df
+            offset = int(click_data['points'][0].get('customdata') or 0)
+        except (KeyError, IndexError, TypeError, ValueError):
+            offset = 0
+    if not offset:
+        fig = figure_cache.get_or_build(
+            ('figure', 'industry', filters_key(filters)),
+            data.version,
+            lambda: wrangle.build_figure('industry', filters, data)
+        )
     else:
-        filtered_df = df
-    investors = []
-    for i, row in filtered_df.iterrows():
-        if pd.notna(row.get("Select Investors")):
-            investors.extend(row["Select Investors"].split(', '))
+        fig = figure_cache.get_or_build(
+            ('figure', 'industry', offset, filters_key(filters)),
+            data.version,
+            lambda: wrangle.create_industry_chart(filters, data, offset=offset)
+        )
+    return highlight_figure(fig, selection_target(selection, data), 'industry')
+
+def triggered_by(component_id):
+    """True when the running callback was fired by component_id"""
+    try:
+        return dash.ctx.triggered_id == component_id
+    except MissingCallbackContextException:
+        # called directly, e.g. from bench.py
+        return False
+
+def visible_years(relayout_data):
+    """Founded year range the user zoomed to on the line chart, or None"""
+    if not relayout_data:
+        return None
+    bounds = relayout_data.get('xaxis.range')
+    if bounds is None and 'xaxis.range[0]' in relayout_data:
+        bounds = (relayout_data['xaxis.range[0]'], relayout_data.get('xaxis.range[1]'))
+    try:
+        return math.ceil(float(bounds[0])), math.floor(float(bounds[1]))
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def visible_months(relayout_data):
+    """Join months (see timeline.month_numbers) inside the range picked on the timeline, or None"""
+    if not relayout_data:
+        return None
+    bounds = relayout_data.get('xaxis.range')
+    if bounds is None and 'xaxis.range[0]' in relayout_data:
+        bounds = (relayout_data['xaxis.range[0]'], relayout_data.get('xaxis.range[1]'))
+    try:
+        low, high = pd.Timestamp(bounds[0]), pd.Timestamp(bounds[1])
+    except (TypeError, ValueError, IndexError):
+        return None
+    # months are plotted on their first day, a range starting mid-month leaves that month out
+    start = low.year * 12 + low.month - 1 + (low > pd.Timestamp(low.year, low.month, 1))
+    return int(start), high.year * 12 + high.month - 1
+
+@app.callback(
+    Output('kpi_funding', 'children'),
+    Output('kpi_unicorn', 'children'),
+    Output('kpi_valuation', 'children'),
+    *DATA_INPUTS
+)
+@metrics.instrument('update_kpis', serialize=True)
+def update_kpis(countries, industries, stages, years, _version=None):
+    data = wrangle.current()
+    filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+    valuation, unicorns, funding = wrangle.kpi_totals(filters, data)
+    return f"{funding} $M", f"#{unicorns}", f"~ {valuation} $B"
+
+# layouts of the dict-built callback charts, validated once instead of on every call
+shared_layout = fig_layout.my_figlayout if hasattr(fig_layout, 'my_figlayout') else {}
+SELECT_INDUSTRY_LAYOUT = figure_dicts.preset_layout(
+    dict(title='Select an industry from dropdown', xaxis_title='Year', yaxis_title='Count')
+)
+INDUSTRY_YEARS_LAYOUT = figure_dicts.preset_layout(
+    dict(xaxis_title='Founded Year', yaxis_title='Number of Companies'),
+    shared_layout
+)
+COUNTRY_INVESTORS_LAYOUT = figure_dicts.preset_layout(
+    dict(xaxis_title='Number of Investments', yaxis_title='Investors'),
+    shared_layout
+)
+CO_INVESTORS_LAYOUT = figure_dicts.preset_layout(
+    dict(xaxis_title='Shared companies', yaxis_title='Co-investors'),
+    shared_layout
+)
+SELECT_INVESTOR_LAYOUT = figure_dicts.preset_layout(
+    dict(title='Click an investor to see who invests with them'),
+    shared_layout
+)
+INVESTOR_CLUSTERS_LAYOUT = figure_dicts.preset_layout(
+    dict(xaxis_title='Investors', yaxis_title='Clusters'),
+    shared_layout
+)
+TIMELINE_LAYOUT = figure_dicts.preset_layout(
+    dict(
+        xaxis=dict(title='Date Joined', type='date', rangeslider=dict(visible=True)),
+        yaxis_title='Unicorns',
+        yaxis2=dict(title='Valuation ($B)', overlaying='y', side='right', showgrid=False),
+        legend=dict(orientation='h', y=1.1)
+    ),
+    shared_layout
+)
+TIME_TO_UNICORN_LAYOUT = figure_dicts.preset_layout(
+    dict(xaxis_title='Years from founding to unicorn', yaxis_title='Companies'),
+    shared_layout
+)
+
+@metrics.instrument('build_industry_years')
+def build_industry_years(value, filters=None, data=None):
+    """Line chart of companies founded per year for one industry, binned past wrangle.MAX_POINTS"""
+    if value:
+        num_by_founded_year = wrangle.founded_year_counts(value, filters, data)
+        
+        if len(num_by_founded_year):
+            num_by_founded_year = num_by_founded_year[num_by_founded_year.index >= 1990]
+            num_by_founded_year, width = wrangle.bin_series(num_by_founded_year)
+            title = f'Companies Founded by Year - {value}'
+            if width > 1:
+                title += f' ({width}-year bins, zoom in for detail)'
+            return figure_dicts.figure([{
+                'type': 'scatter',
+                'x': figure_dicts.numbers(num_by_founded_year.index),
+                'y': figure_dicts.numbers(num_by_founded_year.values),
+                'fillcolor': 'rgba(178, 211, 194,0.11)',
+                'fill': 'tonexty',
+                'mode': 'lines+markers',
+                'line': {'color': '#3DED97'},
+                'name': f'{value} Companies'
+            }], INDUSTRY_YEARS_LAYOUT, title={'text': title})
     
-    if investors:
-        investors_series = pd.Series(investors).value_counts()[:10]
-        investors_series.sort_values(ascending=True, inplace=True)
+    return figure_dicts.figure([], SELECT_INDUSTRY_LAYOUT)
+
+@metrics.instrument('build_country_investors')
+def build_country_investors(selected_country, filters=None, data=None):
+    """Bar chart of the top investors, overall or for one country"""
+    title = "Top 10 Investors"
+    if selected_country is not None:
+        title = f"Top Investors in {selected_country}"
+    investors_series = wrangle.top_investors(selected_country, filters=filters, data=data)
+    
+    if len(investors_series):
+        investors_series = investors_series.sort_values(ascending=True)
         
-        fig2 = go.Figure([
-            go.Bar(
-                x=investors_series.values, 
-                y=investors_series.index, 
-                orientation='h',
-                marker=dict(color='#3DED97')
-            )
-        ])
-    else:
-        fig2 = go.Figure()
-        fig2.add_annotation(
-            text="No investor data available",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False
-        )
+        return figure_dicts.figure([{
+            'type': 'bar',
+            'x': figure_dicts.numbers(investors_series.values),
+            'y': figure_dicts.labels(investors_series.index),
+            'orientation': 'h',
+            'marker': {'color': '#3DED97'}
+        }], COUNTRY_INVESTORS_LAYOUT, title={'text': title})
     
+    fig2 = go.Figure()
+    fig2.add_annotation(
+        text="No investor data available",
+        xref="paper", yref="paper",
+        x=0.5, y=0.5, showarrow=False
+    )
     fig2.update_layout(
         title=title,
         xaxis_title='Number of Investments',
         yaxis_title='Investors'
     )
-    if hasattr(fig_layout, 'my_figlayout'):
-        fig2.update_layout(fig_layout.my_figlayout)
+    fig2.update_layout(shared_layout)
     
     return fig2
 
+@metrics.instrument('update_output', serialize=True)
+def update_output(value, relayout_data=None, countries=None, industries=None, stages=None, years=None, _version=None):
+    data = wrangle.current()
+    filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+    # zooming fetches the visible years at full resolution, any other change starts unzoomed
+    zoom = visible_years(relayout_data) if triggered_by('figurethree') else None
+    if zoom is not None:
+        filters = wrangle.restrict_years(filters, *zoom)
+        if filters is None:
+            raise PreventUpdate
+    return figure_cache.get_or_build(
+        ('industry_years', value, filters_key(filters)),
+        data.version,
+        lambda: build_industry_years(value, filters, data)
+    )
+
+@metrics.instrument('update_graph', serialize=True)
+def update_graph(option_slctd, countries=None, industries=None, stages=None, years=None, _version=None, selection=None):
+    data = wrangle.current()
+    filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+    selected_country = None
+    
+    if option_slctd:
+        try:
+            selected_country = option_slctd['points'][0]['hovertext']
+        except (KeyError, IndexError):
+            selected_country = None
+    fig = figure_cache.get_or_build(
+        ('country_investors', selected_country, filters_key(filters)),
+        data.version,
+        lambda: build_country_investors(selected_country, filters, data)
+    )
+    return highlight_figure(fig, selection_target(selection, data), 'country_investors')
+
+@metrics.instrument('update_client_data', serialize=True)
+def update_client_data(countries=None, industries=None, stages=None, years=None, _version=None):
+    data = wrangle.current()
+    filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+    return figure_cache.get_or_build(
+        ('client_payload', filters_key(filters)),
+        data.version,
+        lambda: wrangle.client_payload(filters, data)
+    )
+
+if CLIENTSIDE:
+    # hovering and picking an industry redraw in the browser, only filter changes reach the server
+    client_stores.extend([
+        dcc.Store(id='client-data'),
+        dcc.Store(id='client-layouts', data={
+            'select_industry': SELECT_INDUSTRY_LAYOUT,
+            'industry_years': INDUSTRY_YEARS_LAYOUT,
+            'country_investors': COUNTRY_INVESTORS_LAYOUT
+        })
+    ])
+    app.callback(Output('client-data', 'data'), *DATA_INPUTS)(update_client_data)
+    app.clientside_callback(
+        ClientsideFunction(namespace='unicorns', function_name='industryYears'),
+        Output("figurethree", "figure"),
+        Input('demo-dropdown', 'value'),
+        Input('client-data', 'data'),
+        State('client-layouts', 'data')
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='unicorns', function_name='countryInvestors'),
+        Output('next-graph', 'figure'),
+        Input('figurefour', 'hoverData'),
+        Input('client-data', 'data'),
+        SEARCH_INPUT,
+        State('client-layouts', 'data')
+    )
+else:
+    app.callback(
+        Output("figurethree", "figure"),
+        Input('demo-dropdown', 'value'),
+        Input('figurethree', 'relayoutData'),
+        *DATA_INPUTS
+    )(update_output)
+    app.callback(
+        Output('next-graph', 'figure'),
+        Input('figurefour', 'hoverData'),
+        *DATA_INPUTS,
+        SEARCH_INPUT
+    )(update_graph)
+
+@app.callback(
+    Output('search', 'options'),
+    Input('search', 'search_value'),
+    State('search', 'value')
+)
+@metrics.instrument('update_search')
+def update_search(search_value, selection):
+    # typeahead: the options are the ranked matches of what was typed so far
+    if not search_value:
+        raise PreventUpdate
+    matches = wrangle.search_names(search_value, limit=10)
+    options = [search_option(kind, label, row, search_value) for kind, label, row in matches]
+    if selection and selection not in [option['value'] for option in options]:
+        try:
+            options.append(search_option(*json.loads(selection)))
+        except (TypeError, ValueError):
+            pass
+    return options
+
+@metrics.instrument('build_co_investors')
+def build_co_investors(investor, filters=None, data=None):
+    """Bar chart of the investors sharing the most companies with one investor"""
+    if not investor:
+        return figure_dicts.figure([], SELECT_INVESTOR_LAYOUT)
+    unavailable = wrangle.investor_links_unavailable(data)
+    if unavailable:
+        return figure_dicts.figure([], CO_INVESTORS_LAYOUT, title={'text': f'Co-investors {unavailable}'})
+    shared = wrangle.co_investors(investor, filters=filters, data=data).sort_values(ascending=True)
+    return figure_dicts.figure([{
+        'type': 'bar',
+        'x': figure_dicts.numbers(shared.values),
+        'y': figure_dicts.labels(shared.index),
+        'orientation': 'h',
+        'marker': {'color': '#3DED97'}
+    }], CO_INVESTORS_LAYOUT, title={'text': f'Top co-investors of {investor}'})
+
+@app.callback(
+    Output('co-investors', 'figure'),
+    Input('next-graph', 'clickData'),
+    *DATA_INPUTS
+)
+@metrics.instrument('update_co_investors', serialize=True)
+def update_co_investors(click_data, countries=None, industries=None, stages=None, years=None, _version=None):
+    data = wrangle.current()
+    filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+    investor = None
+    if click_data:
+        try:
+            investor = click_data['points'][0]['y']
+        except (KeyError, IndexError):
+            investor = None
+    return figure_cache.get_or_build(
+        ('co_investors', investor, filters_key(filters)),
+        data.version,
+        lambda: build_co_investors(investor, filters, data)
+    )
+
+# largest investor clusters drawn, the rest are usually pairs
+MAX_CLUSTERS = 10
+
+@metrics.instrument('build_investor_clusters')
+def build_investor_clusters(filters=None, data=None):
+    """Bar chart of the largest groups of investors that repeatedly invest together"""
+    unavailable = wrangle.investor_links_unavailable(data)
+    if unavailable:
+        return figure_dicts.figure([], INVESTOR_CLUSTERS_LAYOUT, title={'text': f'Investor clusters {unavailable}'})
+    clusters = wrangle.investor_clusters(filters, limit=MAX_CLUSTERS, data=data)
+    if not clusters:
+        return figure_dicts.figure([], INVESTOR_CLUSTERS_LAYOUT, title={'text': 'No investor clusters in this selection'})
+    # horizontal bars are drawn bottom-up, keep the largest cluster on top
+    clusters = clusters[::-1]
+    return figure_dicts.figure([{
+        'type': 'bar',
+        'x': [len(members) for members in clusters],
+        'y': [', '.join(members[:2]) + (f' +{len(members) - 2}' if len(members) > 2 else '') for members in clusters],
+        'hovertext': [
+            '<br>'.join(members[:15]) + (f'<br>and {len(members) - 15} more' if len(members) > 15 else '')
+            for members in clusters
+        ],
+        'hovertemplate': '%{hovertext}<extra>%{x} investors</extra>',
+        'orientation': 'h',
+        'marker': {'color': '#3DED97'}
+    }], INVESTOR_CLUSTERS_LAYOUT, title={'text': 'Investor clusters (2+ shared companies)'})
+
+@app.callback(
+    Output('investor-clusters', 'figure'),
+    *DATA_INPUTS
+)
+@metrics.instrument('update_investor_clusters', serialize=True)
+def update_investor_clusters(countries=None, industries=None, stages=None, years=None, _version=None):
+    data = wrangle.current()
+    filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+    return figure_cache.get_or_build(
+        ('investor_clusters', filters_key(filters)),
+        data.version,
+        lambda: build_investor_clusters(filters, data)
+    )
+
+@metrics.instrument('build_timeline')
+def build_timeline(filters=None, data=None):
+    """Running unicorn count and valuation by join month, with a range slider for the time-to-unicorn chart"""
+    months, counts, valuations = wrangle.timeline_for(filters, data).running()
+    if not len(months):
+        return figure_dicts.figure([], TIMELINE_LAYOUT, title={'text': 'No join dates available'})
+    dates = timeline.month_labels(months)
+    return figure_dicts.figure([{
+        'type': 'scatter',
+        'x': dates,
+        'y': figure_dicts.numbers(counts),
+        'mode': 'lines',
+        'line': {'color': '#3DED97'},
+        'name': 'Unicorns'
+    }, {
+        'type': 'scatter',
+        'x': dates,
+        'y': figure_dicts.numbers(valuations),
+        'yaxis': 'y2',
+        'mode': 'lines',
+        'line': {'color': '#B2D3C2', 'dash': 'dot'},
+        'name': 'Valuation ($B)'
+    }], TIMELINE_LAYOUT, title={'text': 'Cumulative Unicorns by Join Month'})
+
+@metrics.instrument('build_time_to_unicorn')
+def build_time_to_unicorn(months=None, filters=None, data=None):
+    """Histogram of years from founding to joining, for the companies that joined within months"""
+    start, end = months or (None, None)
+    history = wrangle.timeline_for(filters, data)
+    years = history.time_to_unicorn(start, end)
+    joined, _ = history.totals(start, end)
+    period = 'all time' if months is None else ' to '.join(timeline.month_labels([start, end]))
+    title = f'Time to Unicorn - {joined} joined, {period}'
+    if len(years):
+        # the median is where the running count passes half of the dated companies
+        median = years.index[np.searchsorted(years.cumsum().to_numpy(), years.sum() / 2)]
+        title += f', median {median} years'
+    return figure_dicts.figure([{
+        'type': 'bar',
+        'x': figure_dicts.numbers(years.index),
+        'y': figure_dicts.numbers(years.values),
+        'marker': {'color': '#3DED97'}
+    }], TIME_TO_UNICORN_LAYOUT, title={'text': title})
+
+@app.callback(
+    Output('timeline', 'figure'),
+    *DATA_INPUTS
+)
+@metrics.instrument('update_timeline', serialize=True)
+def update_timeline(countries=None, industries=None, stages=None, years=None, _version=None):
+    data = wrangle.current()
+    filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+    return figure_cache.get_or_build(
+        ('timeline', filters_key(filters)),
+        data.version,
+        lambda: build_timeline(filters, data)
+    )
+
+@app.callback(
+    Output('time-to-unicorn', 'figure'),
+    Input('timeline', 'relayoutData'),
+    *DATA_INPUTS
+)
+@metrics.instrument('update_time_to_unicorn', serialize=True)
+def update_time_to_unicorn(relayout_data=None, countries=None, industries=None, stages=None, years=None, _version=None):
+    data = wrangle.current()
+    filters = wrangle.make_filters(countries, industries, stages, years, data=data)
+    # dragging the range slider only re-slices the cumulative arrays, new filters start from all time
+    months = visible_months(relayout_data) if triggered_by('timeline') else None
+    return figure_cache.get_or_build(
+        ('time_to_unicorn', months, filters_key(filters)),
+        data.version,
+        lambda: build_time_to_unicorn(months, filters, data)
+    )
+
 if __name__ == '__main__':
     app.run(debug=True, port=8001)
@@ -0,0 +1,173 @@
+// Clientside mode (UNICORN_CLIENTSIDE=1): the industry-years and country-investors charts are
+// built in the browser from the typed arrays of the client-data store, mirroring
+// build_industry_years and build_country_investors in app.py.
+(function () {
+    var TYPES = {
+        int8: Int8Array, uint8: Uint8Array, int16: Int16Array, uint16: Uint16Array,
+        int32: Int32Array, uint32: Uint32Array, float32: Float32Array, float64: Float64Array
+    };
+    var decoded = new WeakMap();
+
+    function decode(encoded) {
+        var binary = atob(encoded.bdata);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new TYPES[encoded.dtype](bytes.buffer);
+    }
+
+    function columns(payload) {
+        // decode each store value once, hovering re-runs the callback many times
+        var cached = decoded.get(payload);
+        if (!cached) {
+            cached = {};
+            ['iy_industry', 'iy_year', 'iy_count', 'ci_country', 'ci_investor', 'ci_count'].forEach(function (key) {
+                cached[key] = decode(payload[key]);
+            });
+            decoded.set(payload, cached);
+        }
+        return cached;
+    }
+
+    function merge(base, updates) {
+        var merged = Object.assign({}, base);
+        Object.keys(updates).forEach(function (key) {
+            var value = updates[key];
+            var current = merged[key];
+            if (value && typeof value === 'object' && !Array.isArray(value) &&
+                current && typeof current === 'object' && !Array.isArray(current)) {
+                merged[key] = merge(current, value);
+            } else {
+                merged[key] = value;
+            }
+        });
+        return merged;
+    }
+
+    function binned(xs, ys, maxPoints) {
+        if (xs.length <= maxPoints) {
+            return {x: xs, y: ys, width: 1};
+        }
+        var start = xs[0];
+        var width = Math.ceil((xs[xs.length - 1] - start + 1) / maxPoints);
+        var x = [], y = [];
+        for (var i = 0; i < xs.length; i++) {
+            var bin = start + Math.floor((xs[i] - start) / width) * width;
+            if (x.length && x[x.length - 1] === bin) {
+                y[y.length - 1] += ys[i];
+            } else {
+                x.push(bin);
+                y.push(ys[i]);
+            }
+        }
+        return {x: x, y: y, width: width};
+    }
+
+    function selectedInvestor(selection) {
+        try {
+            var parsed = JSON.parse(selection);
+            return parsed[0] === 'Investor' ? parsed[1] : null;
+        } catch (e) {
+            return null;
+        }
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        unicorns: {
+            industryYears: function (value, payload, layouts) {
+                if (!payload || !layouts) {
+                    return window.dash_clientside.no_update;
+                }
+                var code = value ? payload.industries.indexOf(value) : -1;
+                if (code < 0) {
+                    return {data: [], layout: layouts.select_industry};
+                }
+                var cols = columns(payload);
+                var found = false, xs = [], ys = [];
+                for (var i = 0; i < cols.iy_industry.length; i++) {
+                    if (cols.iy_industry[i] === code) {
+                        found = true;
+                        if (cols.iy_year[i] >= 1990) {
+                            xs.push(cols.iy_year[i]);
+                            ys.push(cols.iy_count[i]);
+                        }
+                    }
+                }
+                if (!found) {
+                    return {data: [], layout: layouts.select_industry};
+                }
+                var bins = binned(xs, ys, payload.max_points);
+                var title = 'Companies Founded by Year - ' + value;
+                if (bins.width > 1) {
+                    title += ' (' + bins.width + '-year bins, zoom in for detail)';
+                }
+                return {
+                    data: [{
+                        type: 'scatter',
+                        x: bins.x,
+                        y: bins.y,
+                        fillcolor: 'rgba(178, 211, 194,0.11)',
+                        fill: 'tonexty',
+                        mode: 'lines+markers',
+                        line: {color: '#3DED97'},
+                        name: value + ' Companies'
+                    }],
+                    layout: merge(layouts.industry_years, {title: {text: title}})
+                };
+            },
+
+            countryInvestors: function (hoverData, payload, selection, layouts) {
+                if (!payload || !layouts) {
+                    return window.dash_clientside.no_update;
+                }
+                var country = null;
+                if (hoverData && hoverData.points && hoverData.points.length) {
+                    country = hoverData.points[0].hovertext;
+                    if (country === undefined) {
+                        country = null;
+                    }
+                }
+                var title = country === null ? 'Top 10 Investors' : 'Top Investors in ' + country;
+                var code = country === null ? -1 : payload.countries.indexOf(country);
+                var rows = [];
+                if (country === null || code >= 0) {
+                    var cols = columns(payload);
+                    for (var i = 0; i < cols.ci_country.length; i++) {
+                        if (cols.ci_country[i] === code) {
+                            rows.push({name: payload.investors[cols.ci_investor[i]], count: cols.ci_count[i]});
+                        }
+                    }
+                }
+                if (!rows.length) {
+                    return {
+                        data: [],
+                        layout: merge(layouts.country_investors, {
+                            title: {text: title},
+                            annotations: [{
+                                text: 'No investor data available', xref: 'paper', yref: 'paper',
+                                x: 0.5, y: 0.5, showarrow: false
+                            }]
+                        })
+                    };
+                }
+                var names = rows.map(function (row) { return row.name; });
+                var investor = selectedInvestor(selection);
+                return {
+                    data: [{
+                        type: 'bar',
+                        x: rows.map(function (row) { return row.count; }),
+                        y: names,
+                        orientation: 'h',
+                        marker: {
+                            color: investor && names.indexOf(investor) >= 0
+                                ? names.map(function (name) { return name === investor ? '#FFD166' : '#3DED97'; })
+                                : '#3DED97'
+                        }
+                    }],
+                    layout: merge(layouts.country_investors, {title: {text: title}})
+                };
+            }
+        }
+    });
+})();
@@ -0,0 +1,245 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# benchmarks measure real builds, keep the shared figure cache and the CSV reloader out of the way
+os.environ.setdefault("FIGURE_CACHE_PATH", "")
+os.environ.setdefault("UNICORN_RELOAD_INTERVAL", "0")
+
+import wrangle
+
+BENCH_DIR = os.path.join(wrangle.CACHE_DIR, "bench")
+SIZES = {'1k': 1_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+COLUMNS = [
+    'Company', 'Valuation ($B)', 'Date Joined', 'Country', 'City', 'Industry',
+    'Select Inverstors', 'Founded Year', 'Total Raised', 'Financial Stage',
+    'Investors Count', 'Deal Terms', 'Portfolio Exits'
+]
+# share of Kaggle rows with no investors, which the source file shifts one column right
+SHIFTED_SHARE = 17 / 1037
+
+
+def vocabulary(path=wrangle.SOURCE_CSV):
+    """Countries, cities, industries, stages and investors to draw synthetic rows from"""
+    try:
+        raw = pd.read_csv(path)
+    except FileNotFoundError:
+        raw = wrangle.dummy_frame()
+    clean = wrangle.clean_frame(raw)
+    investors = clean['Select Investors'].dropna().astype(str).str.split(', ').explode()
+    return {
+        'Country': clean['Country'].dropna().astype(str).unique(),
+        'City': clean['City'].dropna().astype(str).unique(),
+        # raw spellings such as "Finttech" are kept, the cleaning pass fixes them
+        'Industry': raw.loc[raw['Select Inverstors'].notna(), 'Industry'].dropna().astype(str).unique(),
+        'Financial Stage': raw['Financial Stage'].dropna().astype(str).unique(),
+        'Investor': investors.unique()
+    }
+
+
+def generate_rows(n, seed=0, vocab=None):
+    """Raw rows in the Unicorn_Companies.csv schema, quirks included
+
+    Valuations are "$7.44"-style strings, Total Raised mixes "$7.44B"/"$300M"/"$950K",
+    missing values are the literal "None", and about 1.6% of the rows have no investors
+    and are shifted one column to the right. Label 789 keeps the Kaggle exception of
+    an unshifted row without investors.
+    """
+    vocab = vocab or vocabulary()
+    rng = np.random.default_rng(seed)
+
+    def pick(values):
+        return pd.Series(np.asarray(values, dtype=object)[rng.integers(0, len(values), n)])
+
+    valuation = np.round(rng.lognormal(0.7, 0.8, n) + 1, 2)
+    raised = rng.lognormal(5.5, 1.3, n)
+    unit = np.where(raised >= 1000, 'B', np.where(raised >= 1, 'M', 'K'))
+    amount = np.where(raised >= 1000, raised / 1000, np.where(raised >= 1, raised, raised * 1000))
+    joined = pd.Timestamp('2007-01-01') + pd.to_timedelta(rng.integers(0, 15 * 365, n), unit='D')
+
+    counts = rng.integers(1, 5, n)
+    investors = pick(vocab['Investor'])
+    for k in range(1, 4):
+        investors = investors.where(counts <= k, investors + ', ' + pick(vocab['Investor']))
+
+    frame = pd.DataFrame({
+        'Company': 'Company ' + pd.Series(np.arange(n)).astype(str),
+        'Valuation ($B)': '$' + pd.Series(valuation).astype(str),
+        'Date Joined': joined.month.astype(str) + '/' + joined.day.astype(str) + '/' + joined.year.astype(str),
+        'Country': pick(vocab['Country']),
+        'City': pick(vocab['City']),
+        'Industry': pick(vocab['Industry']),
+        'Select Inverstors': investors,
+        'Founded Year': rng.integers(1990, 2021, n).astype(float),
+        'Total Raised': '$' + pd.Series(np.round(amount, 3)).astype(str) + unit,
+        'Financial Stage': pick(vocab['Financial Stage']).where(rng.random(n) < 0.1, 'None'),
+        'Investors Count': rng.integers(1, 40, n).astype(float),
+        'Deal Terms': rng.integers(1, 15, n).astype(float),
+        'Portfolio Exits': pd.Series(rng.integers(1, 5, n).astype(str)).where(rng.random(n) < 0.1, 'None')
+    }, columns=COLUMNS)
+
+    shifted = rng.random(n) < SHIFTED_SHARE
+    if n > 789:
+        shifted[789] = False
+    frame.loc[shifted, 'City'] = frame.loc[shifted, 'Industry']
+    frame.loc[shifted, 'Industry'] = frame.loc[shifted, 'Select Inverstors']
+    frame.loc[shifted, 'Select Inverstors'] = np.nan
+    if n > 789:
+        frame.loc[789, 'Select Inverstors'] = np.nan
+    return frame
+
+
+def synthetic_csv(n, seed=0, vocab=None):
+    """Path of a generated CSV with n rows, written once per size and seed"""
+    path = os.path.join(BENCH_DIR, f"unicorns-{n}-{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        generate_rows(n, seed, vocab).to_csv(tmp, index=False)
+        os.replace(tmp, path)
+    return path
+
+
+def measure(fn, repeat=1, memory=True):
+    """Best wall time over repeat runs and the peak traced allocation of one more run"""
+    result = None
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    peak_mb = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return result, {'seconds': round(min(times), 6), 'peak_mb': None if peak_mb is None else round(peak_mb, 3)}
+
+
+def callbacks():
+    """The Dash callbacks to invoke directly, or None when the app cannot be imported"""
+    try:
+        import app
+    except ImportError as e:
+        print(f"Warning: could not import app, skipping callbacks: {e}")
+        return None
+    return app
+
+
+def run_size(label, n, args, vocab, dash_app):
+    """Benchmark every step on a synthetic dataset of n rows"""
+    results = []
+
+    def record(step, fn):
+        value, stats = measure(fn, args.repeat, not args.no_memory)
+        results.append({'size': label, 'rows': n, 'step': step, **stats})
+        memory = '' if stats['peak_mb'] is None else f"{stats['peak_mb']:>10.1f} MB"
+        print(f"{label:>5} {step:<32} {stats['seconds']:>10.4f}s  {memory}")
+        return value
+
+    path = synthetic_csv(n, args.seed, vocab)
+    raw = record('read_csv', lambda: pd.read_csv(path))
+    if n <= args.legacy_max:
+        record('clean_and_process_data', lambda: wrangle.clean_and_process_data(raw.copy()))
+    frame = record('clean_frame', lambda: wrangle.clean_frame(raw))
+    raw = None  # let the raw frame go before the 10M dataset build
+    data = record('dataset', lambda: wrangle.Dataset(frame, f"bench-{n}"))
+    for name, builder in wrangle.FIGURE_BUILDERS.items():
+        record(f"figure:{name}", lambda: builder(None, data))
+
+    if dash_app is not None:
+        industry = wrangle.industries(data)[0]
+        country = data.cube['Country'].value_counts().index[0]
+        hover = {'points': [{'hovertext': country}]}
+        previous = wrangle.current()
+        wrangle.publish(data)
+        try:
+            def update_output():
+                dash_app.figure_cache.clear()
+                return dash_app.update_output(industry)
+
+            def update_graph():
+                dash_app.figure_cache.clear()
+                return dash_app.update_graph(hover)
+
+            record('callback:update_output', update_output)
+            record('callback:update_graph', update_graph)
+        finally:
+            wrangle.publish(previous)
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Print steps slower than threshold times the baseline, returns how many regressed"""
+    with open(baseline_path) as f:
+        baseline = {(r['size'], r['step']): r for r in json.load(f)['results']}
+    regressions = 0
+    for r in results:
+        old = baseline.get((r['size'], r['step']))
+        if old is None or not old['seconds']:
+            continue
+        ratio = r['seconds'] / old['seconds']
+        if ratio > threshold:
+            regressions += 1
+            print(f"REGRESSION {r['size']} {r['step']}: {old['seconds']:.4f}s -> {r['seconds']:.4f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loading, cleaning, figure builds and callbacks")
+    parser.add_argument('--sizes', default='1k,100k,1M,10M', help="comma separated sizes out of " + ", ".join(SIZES))
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per step, the best one is kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--legacy-max', type=int, default=100_000,
+                        help="largest size to run the row-wise clean_and_process_data on")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run of each step")
+    parser.add_argument('--no-callbacks', action='store_true', help="do not import app.py")
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--compare', help="earlier results JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    labels = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in labels if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes {unknown}, choose from {list(SIZES)}")
+
+    vocab = vocabulary()
+    dash_app = None if args.no_callbacks else callbacks()
+    results = []
+    for label in labels:
+        results.extend(run_size(label, SIZES[label], args, vocab, dash_app))
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
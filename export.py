@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+
+# the bundle is built from fresh figures, keep the shared figure cache and the CSV reloader out of the way
+os.environ.setdefault("FIGURE_CACHE_PATH", "")
+os.environ.setdefault("UNICORN_RELOAD_INTERVAL", "0")
+
+from plotly.offline import get_plotlyjs
+
+import app
+import wrangle
+from figure_cache import figure_to_json
+
+MANIFEST = 'manifest.json'
+# dropdowns whose every value is exported, the cross-filters and search need the server
+STATIC_DROPDOWNS = {'demo-dropdown'}
+# fontSize -> font-size
+_css_name = re.compile(r'(?=[A-Z])')
+BOOTSTRAP_CLASSES = {'Row': 'row', 'Card': 'card', 'CardBody': 'card-body', 'CardHeader': 'card-header'}
+
+SCRIPT = """
+const VARIANTS = %s;
+const loaded = {};
+
+function show(id, path) {
+    if (!path) {
+        return Promise.resolve(document.getElementById(id));
+    }
+    loaded[path] = loaded[path] || fetch(path).then(response => response.json());
+    return loaded[path].then(fig => Plotly.react(id, fig.data, fig.layout, {responsive: true}));
+}
+
+Object.entries(VARIANTS.static).forEach(([id, path]) => show(id, path));
+
+const dropdown = document.getElementById('demo-dropdown');
+const industryYears = () => show('figurethree', VARIANTS.industry_years[dropdown.value]);
+dropdown.addEventListener('change', industryYears);
+industryYears();
+
+show('figurefour', VARIANTS.static.figurefour).then(gd => gd.on('plotly_hover', event => {
+    const country = event.points[0].hovertext;
+    if (country in VARIANTS.country_investors) {
+        show('next-graph', VARIANTS.country_investors[country]);
+    }
+}));
+show('next-graph', VARIANTS.country_investors['']).then(gd => gd.on('plotly_click', event => {
+    const investor = event.points[0].y;
+    if (investor in VARIANTS.co_investors) {
+        show('co-investors', VARIANTS.co_investors[investor]);
+    }
+}));
+show('co-investors', VARIANTS.co_investors['']);
+// the "Other" bar carries the offset that expands it, every other bar leads back to 0
+show('figureone', VARIANTS.industry['0']).then(gd => gd.on('plotly_click', event => {
+    show('figureone', VARIANTS.industry[String(event.points[0].customdata || 0)] || VARIANTS.industry['0']);
+}));
+"""
+
+
+def slug(value):
+    """Readable file name for a variant value, with a hash so different values never collide"""
+    text = re.sub(r'[^a-z0-9]+', '-', str(value).lower()).strip('-')[:40]
+    return f"{text or 'all'}-{hashlib.sha1(str(value).encode()).hexdigest()[:8]}"
+
+
+def serialized(build, *args):
+    return lambda: figure_to_json(build(*args))
+
+
+def industry_offsets(data):
+    """Offsets of the "Other" bar expansions of the industry chart, 0 included"""
+    count = len(wrangle.rollup('Industry', 'valuation', data=data)) if 'Industry' in data.cube.columns else 0
+    step = wrangle.MAX_BARS - 1
+    return [0] + list(range(step, count, step)) if count > wrangle.MAX_BARS else [0]
+
+
+def figure_tasks(data):
+    """Every figure of the bundle as {path: build returning JSON}, and the variant index for the page
+
+    Besides the unfiltered charts the bundle holds each dropdown industry,
+    each hovered country, each investor bar that can be clicked for its
+    co-investors and each page of the industry chart.
+    """
+    tasks = {}
+    variants = {'static': {}, 'industry': {}, 'industry_years': {}, 'country_investors': {}, 'co_investors': {}}
+
+    def add(group, key, path, build, *args):
+        tasks[path] = serialized(build, *args)
+        variants[group][key] = path
+
+    for graph_id, name in app.STATIC_FIGURES.items():
+        add('static', graph_id, f'figures/{name}.json', wrangle.get_figure, name, data)
+    add('static', 'timeline', 'figures/timeline.json', app.build_timeline, None, data)
+    add('static', 'time-to-unicorn', 'figures/time_to_unicorn.json', app.build_time_to_unicorn, None, None, data)
+    add('static', 'investor-clusters', 'figures/investor_clusters.json', app.build_investor_clusters, None, data)
+    for offset in industry_offsets(data):
+        if offset:
+            add('industry', str(offset), f'figures/industry/{offset}.json', wrangle.create_industry_chart, None, data, offset)
+        else:
+            add('industry', '0', 'figures/industry/0.json', wrangle.get_figure, 'industry', data)
+    for industry in wrangle.industries(data):
+        add('industry_years', industry, f'figures/industry_years/{slug(industry)}.json',
+            app.build_industry_years, industry, None, data)
+
+    countries = sorted(str(country) for country in data.cube['Country'].dropna().unique()) \
+        if 'Country' in data.cube.columns else []
+    investors = set()
+    for country in [None] + countries:
+        key = country or ''
+        add('country_investors', key, f'figures/country_investors/{slug(key)}.json',
+            app.build_country_investors, country, None, data)
+        investors.update(wrangle.top_investors(country, data=data).index)
+    add('co_investors', '', 'figures/co_investors/select.json', app.build_co_investors, None, None, data)
+    for investor in sorted(investors):
+        add('co_investors', investor, f'figures/co_investors/{slug(investor)}.json',
+            app.build_co_investors, investor, None, data)
+    return tasks, variants
+
+
+def _attributes(props, classes=()):
+    classes = [c for c in list(classes) + [props.get('className')] if c]
+    attributes = []
+    if props.get('id') is not None:
+        attributes.append(f'id="{html.escape(str(props["id"]))}"')
+    if classes:
+        attributes.append(f'class="{html.escape(" ".join(classes))}"')
+    if props.get('style'):
+        css = ';'.join(f"{_css_name.sub(r'-', key).lower()}:{value}" for key, value in props['style'].items())
+        attributes.append(f'style="{html.escape(css)}"')
+    return ''.join(' ' + a for a in attributes)
+
+
+def render(component):
+    """Static HTML of a Dash layout
+
+    html components map to their tags and bootstrap components to their
+    classes. Graphs become empty divs filled by the page script, server-only
+    controls are left out.
+    """
+    if component is None:
+        return ''
+    if isinstance(component, (list, tuple)):
+        return ''.join(render(child) for child in component)
+    if not hasattr(component, 'to_plotly_json'):
+        return html.escape(str(component))
+
+    kind, namespace = component._type, component._namespace
+    props = {key: getattr(component, key, None) for key in component._prop_names}
+    inner = render(props.get('children'))
+    if namespace == 'dash_html_components':
+        tag = kind.lower()
+        return f'<{tag}{_attributes(props)}>{inner}</{tag}>'
+    if namespace == 'dash_bootstrap_components':
+        if kind == 'Container':
+            classes = ['container-fluid' if props.get('fluid') else 'container']
+        elif kind == 'Col':
+            classes = [f"col-{props['width']}" if props.get('width') else 'col']
+        else:
+            classes = [BOOTSTRAP_CLASSES.get(kind, '')]
+        return f'<div{_attributes(props, classes)}>{inner}</div>'
+    if kind == 'Graph':
+        return f'<div{_attributes(props)}></div>'
+    if kind == 'Dropdown' and props.get('id') in STATIC_DROPDOWNS:
+        choices = props.get('options') or []
+        rendered = ''.join(
+            f'<option value="{html.escape(str(o["value"]))}"{" selected" if o["value"] == props.get("value") else ""}>'
+            f'{html.escape(str(o["label"]))}</option>'
+            for o in choices
+        )
+        return f'<select{_attributes(props, ["form-select", "mb-2"])}>{rendered}</select>'
+    return ''
+
+
+def page(variants):
+    """index.html of the bundle: the app layout with the current snapshot's KPI banners"""
+    styles = ''.join(f'<link rel="stylesheet" href="{html.escape(href)}">' for href in app.app.config.external_stylesheets)
+    return (
+        '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+        f'<title>{html.escape(app.app.title)}</title>\n{styles}\n'
+        '<script src="plotly.min.js"></script>\n</head>\n<body>\n'
+        f'{render(app.serve_layout())}\n'
+        f'<script>{SCRIPT % json.dumps(variants)}</script>\n</body>\n</html>\n'
+    )
+
+
+def read_manifest(output):
+    try:
+        with open(os.path.join(output, MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'version': None, 'files': {}}
+
+
+def write_file(output, path, content):
+    target = os.path.join(output, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # write then rename, so a static server never hands out half a file
+    with open(target + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(target + '.tmp', target)
+
+
+def export(output, data=None, workers=None, force=False):
+    """Write the static bundle of a snapshot to output, touching only files whose content changed
+
+    Returns the number of files written, 0 when the bundle already matches
+    the snapshot's dataset version. Raises RuntimeError without touching
+    output when a figure fails to build, so the previous bundle stays whole.
+    """
+    data = data or wrangle.current()
+    previous = read_manifest(output)
+    if not force and previous['version'] == data.version:
+        print(f"{output} is up to date with dataset {data.version}")
+        return 0
+
+    start = time.perf_counter()
+    tasks, variants = figure_tasks(data)
+    contents, _ = wrangle.run_builds(tasks, workers)
+    failed = sorted(set(tasks) - set(contents))
+    if failed:
+        raise RuntimeError(f"{len(failed)} figures failed to build ({', '.join(failed)}), {output} left unchanged")
+    contents['index.html'] = page(variants)
+    contents['plotly.min.js'] = get_plotlyjs()
+
+    files, written = {}, 0
+    for path, content in sorted(contents.items()):
+        files[path] = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        if files[path] != previous['files'].get(path) or not os.path.exists(os.path.join(output, path)):
+            write_file(output, path, content)
+            written += 1
+    removed = [path for path in previous['files'] if path not in files]
+    for path in removed:
+        try:
+            os.remove(os.path.join(output, path))
+        except FileNotFoundError:
+            pass
+    write_file(output, MANIFEST, json.dumps({'version': data.version, 'files': files}, indent=1))
+    print(
+        f"Exported {len(files)} files of dataset {data.version} to {output} in {time.perf_counter() - start:.2f}s "
+        f"({written} written, {len(files) - written} unchanged, {len(removed)} removed)"
+    )
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the dashboard as a static HTML/JSON bundle")
+    parser.add_argument('--output', default='site', help="bundle directory, serve it with any static file server")
+    parser.add_argument('--workers', type=int, default=None, help="figure build threads, UNICORN_BUILD_WORKERS by default")
+    parser.add_argument('--force', action='store_true', help="rebuild even when the bundle matches the CSV")
+    parser.add_argument('--watch', type=float, default=0,
+                        help="keep running and re-export whenever the CSV changes, polling every WATCH seconds")
+    args = parser.parse_args(argv)
+
+    try:
+        export(args.output, workers=args.workers, force=args.force)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        if args.watch <= 0:
+            return 1
+    while args.watch > 0:
+        time.sleep(args.watch)
+        if wrangle.reload_if_changed():
+            try:
+                export(args.output, workers=args.workers)
+            except RuntimeError as e:
+                print(f"Error: {e}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:
+    print("Warning: orjson not installed. Figure dicts will be serialized with json.")
+    orjson = None
+
+
+def _plain(value):
+    # numpy arrays and scalars for the standard json encoder
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def figure_to_json(value):
+    """Serialize a plotly figure or a plain figure dict, which may hold numpy arrays"""
+    if hasattr(value, 'to_json'):
+        return value.to_json()
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(value, default=_plain)
+
+
+class SQLiteFigureStore:
+    """Figure JSON store in a SQLite file shared by every worker on the host"""
+
+    def __init__(self, path, ttl=3600, max_entries=2000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS figures ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # sqlite connections cannot be shared between threads, keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Return the stored JSON for key, or None when missing or expired"""
+        row = self._connect().execute(
+            "SELECT value, created FROM figures WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def set(self, key, value):
+        """Store JSON for key, dropping expired and the oldest entries past max_entries"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO figures (key, value, created) VALUES (?, ?, ?)",
+                (key, value, now)
+            )
+            conn.execute("DELETE FROM figures WHERE created < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM figures WHERE key IN "
+                "(SELECT key FROM figures ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """Drop every stored figure"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM figures")
+
+
+class FigureCache:
+    """Size-bounded LRU cache for callback figures, scoped to one dataset version"""
+
+    def __init__(self, maxsize=256, backend=None, listener=None):
+        self.maxsize = maxsize
+        self.backend = backend
+        # optional listener(key, result) told whether a lookup was a "hit", "shared_hit" or "miss"
+        self.listener = listener
+        self.version = None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, version, build):
+        """Return the cached figure for key, trying the shared backend before build()"""
+        with self._lock:
+            if version != self.version:
+                # the data was reloaded, nothing cached so far is valid anymore
+                self._entries.clear()
+                self.version = version
+            hit = key in self._entries
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value = self._entries[key]
+        if hit:
+            if self.listener is not None:
+                self.listener(key, 'hit')
+            return value
+
+        stored = None
+        if self.backend is not None:
+            shared_key = json.dumps([version, key], default=str)
+            stored = self.backend.get(shared_key)
+        if stored is not None:
+            value = json.loads(stored)
+        else:
+            value = build()
+            if self.backend is not None:
+                self.backend.set(shared_key, figure_to_json(value))
+
+        with self._lock:
+            if stored is not None:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+            if version == self.version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        if self.listener is not None:
+            self.listener(key, 'miss' if stored is None else 'shared_hit')
+        return value
+
+    def clear(self):
+        """Drop every cached figure"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
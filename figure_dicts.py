@@ -0,0 +1,44 @@
+import copy
+
+import numpy as np
+import plotly.graph_objects as go
+
+
+def merge(base, updates):
+    """Copy of base with updates merged in, only the nested dicts on an updated path are copied"""
+    merged = dict(base)
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def preset_layout(*updates):
+    """Layout dict, default template included, of a go.Figure after update_layout(update) for each update
+
+    Build this once per chart type; callbacks then only merge their titles into it
+    instead of validating the shared fig_layout on every call.
+    """
+    fig = go.Figure()
+    for update in updates:
+        fig.update_layout(update)
+    return copy.deepcopy(fig.layout.to_plotly_json())
+
+
+def labels(values):
+    """Plain list of category labels, safe for any JSON encoder"""
+    return [str(value) for value in values]
+
+
+def numbers(values):
+    """Numeric array for a trace, serialized as a typed array by plotly and orjson"""
+    values = np.asarray(values)
+    # nullable integer columns come out as objects
+    return values.astype(float) if values.dtype == object else values
+
+
+def figure(traces, layout, **updates):
+    """Figure dict Dash can send as is, with updates merged into the preset layout"""
+    return {'data': traces, 'layout': merge(layout, updates) if updates else layout}
@@ -0,0 +1,198 @@
+import functools
+import os
+import threading
+import time
+
+from figure_cache import figure_to_json
+
+# set UNICORN_METRICS=1 to record timings; when unset every decorator returns the function unchanged
+ENABLED = os.environ.get("UNICORN_METRICS", "") not in ("", "0")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by label values"""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                labels = _labels(self.labels, label_values)
+                for bound, n in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {n}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{labels}}} {total}")
+                lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter keyed by label values"""
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}_total{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _labels(names, values):
+    return ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+SECONDS = Histogram(
+    "unicorn_seconds", "Wall time of callbacks and figure builders by phase",
+    ("target", "phase"), LATENCY_BUCKETS
+)
+PAYLOAD_BYTES = Histogram(
+    "unicorn_payload_bytes", "Serialized size of callback outputs", ("target",), SIZE_BUCKETS
+)
+CACHE = Counter(
+    "unicorn_figure_cache", "Figure cache lookups by outcome", ("target", "result")
+)
+
+# innermost instrumented callback or builder of this thread, with the time spent in its phases
+_context = threading.local()
+
+
+class _Frame:
+    __slots__ = ("target", "phases", "open")
+
+    def __init__(self, target):
+        self.target = target
+        self.phases = {}
+        # [phase, seconds spent in nested phases] of the phases currently running
+        self.open = []
+
+
+def _stack():
+    stack = getattr(_context, "stack", None)
+    if stack is None:
+        stack = _context.stack = []
+    return stack
+
+
+def current_target():
+    """Name of the callback or builder running in this thread, or None"""
+    stack = _stack()
+    return stack[-1].target if stack else None
+
+
+def instrument(target, serialize=False):
+    """Record the wall time of a callback or builder, split into the phases timed inside it
+
+    Time not spent in a "filter" or "aggregate" phase is reported as "figure". With
+    serialize=True the result is also JSON-encoded once to record its size and the
+    "serialize" phase.
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            stack = _stack()
+            frame = _Frame(target)
+            stack.append(frame)
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+            for phase, seconds in frame.phases.items():
+                SECONDS.observe((target, phase), seconds)
+            SECONDS.observe((target, "figure"), max(elapsed - sum(frame.phases.values()), 0.0))
+            if serialize:
+                start = time.perf_counter()
+                size = len(figure_to_json(result).encode())
+                SECONDS.observe((target, "serialize"), time.perf_counter() - start)
+                PAYLOAD_BYTES.observe((target,), size)
+                elapsed += time.perf_counter() - start
+            SECONDS.observe((target, "total"), elapsed)
+            return result
+        return wrapper
+    return decorate
+
+
+def timed(phase):
+    """Attribute the time of the decorated helper to phase of the running callback or builder
+
+    A phase nested in another one, e.g. filtering inside an aggregation, is taken
+    out of the outer phase so every second is counted once.
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            stack = _stack()
+            if not stack:
+                return fn(*args, **kwargs)
+            frame = stack[-1]
+            entry = [phase, 0.0]
+            frame.open.append(entry)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                frame.open.pop()
+                frame.phases[phase] = frame.phases.get(phase, 0.0) + elapsed - entry[1]
+                if frame.open:
+                    frame.open[-1][1] += elapsed
+        return wrapper
+    return decorate
+
+
+def record_cache(key, result):
+    """FigureCache listener counting hits, shared hits and misses per running target"""
+    CACHE.inc((current_target() or str(key[0]), result))
+
+
+def expose():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in (SECONDS, PAYLOAD_BYTES, CACHE):
+        lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,125 @@
+import bisect
+import re
+
+import numpy as np
+
+KINDS = ('Company', 'Investor', 'City')
+_word_start = re.compile(r'(?<!\w)\w')
+
+
+class SearchIndex:
+    """Sorted prefix index over company names, investor names and cities
+
+    Every name is indexed under its full text and under each later word, so
+    "cap" finds "Sequoia Capital". A key is stored as its name and the offset
+    of its word in the lowercased name, not as a string of its own. A query
+    is two binary searches over the sorted keys, then the best matches of the
+    whole range are picked by a precomputed priority.
+    """
+
+    def __init__(self, kinds, labels, weights, rows):
+        self.kinds = np.asarray(kinds, dtype='int8')
+        self.labels = np.asarray(labels, dtype=object)
+        self.weights = np.asarray(weights, dtype=float)
+        self.rows = np.asarray(rows, dtype='int64')
+
+        keys, terms, offsets = [], [], []
+        for term, label in enumerate(self.labels):
+            text = str(label).lower()
+            for match in _word_start.finditer(text):
+                keys.append(text[match.start():])
+                terms.append(term)
+                offsets.append(match.start())
+        order = np.array(sorted(range(len(keys)), key=keys.__getitem__), dtype='int64')
+        self.terms = np.asarray(terms, dtype='int32')[order]
+        self.offsets = np.asarray(offsets, dtype='int32')[order]
+
+        # the query-independent part of the ranking: names starting with the key
+        # first, then companies, investors and cities, then larger valuation or
+        # deal count, then alphabetical; lexsort sorts by its last key first
+        ranked = np.lexsort((
+            -self.weights[self.terms],
+            self.kinds[self.terms],
+            self.offsets > 0
+        ))
+        self.priority = np.empty(len(ranked), dtype='int32')
+        self.priority[ranked] = np.arange(len(ranked), dtype='int32')
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _key(self, position):
+        return str(self.labels[self.terms[position]]).lower()[self.offsets[position]:]
+
+    def _search(self, text, side=bisect.bisect_left):
+        return side(range(len(self.terms)), text, key=self._key)
+
+    def query(self, text, limit=10):
+        """Best matches for a typed prefix as (kind, label, row) tuples
+
+        Exact names rank first, then names starting with the prefix, then
+        later-word matches; ties go to companies, then investors, then cities,
+        and within a kind to the larger valuation or deal count. Every key
+        starting with the prefix is ranked, however short the prefix.
+        """
+        prefix = str(text or '').strip().lower()
+        if not prefix or not len(self.terms):
+            return []
+        low = self._search(prefix)
+        high = self._search(prefix + '\U0010ffff')
+        if low >= high:
+            return []
+
+        # keys equal to the prefix sort first in the range
+        exact = np.arange(low, self._search(prefix, bisect.bisect_right))
+        exact = exact[self.offsets[exact] == 0]
+        exact = exact[np.argsort(self.priority[exact], kind='stable')]
+        priority = self.priority[low:high]
+        count = min(len(priority), 4 * limit)
+        while True:
+            best = np.argpartition(priority, count - 1)[:count] if count < len(priority) else np.arange(len(priority))
+            best = low + best[np.argsort(priority[best], kind='stable')]
+            # a name matching under several words counts once, at its best key
+            terms = list(dict.fromkeys(self.terms[np.concatenate([exact, best])].tolist()))
+            if len(terms) >= limit or count == len(priority):
+                break
+            count = min(len(priority), 4 * count)
+        return [(KINDS[self.kinds[t]], self.labels[t], int(self.rows[t])) for t in terms[:limit]]
+
+
+def build_search_index(frame, investor_counts=None):
+    """SearchIndex over the Company, City and investor names of a cleaned frame"""
+    kinds, labels, weights, rows = [], [], [], []
+    if 'Company' in frame.columns:
+        companies = frame['Company'].reset_index(drop=True)
+        present = companies.notna().to_numpy()
+        positions = np.flatnonzero(present)
+        valuation = frame['Valuation ($B)'].to_numpy(dtype=float, na_value=0) if 'Valuation ($B)' in frame.columns \
+            else np.zeros(len(frame))
+        kinds.append(np.zeros(len(positions)))
+        labels.append(companies.to_numpy(dtype=object)[positions])
+        weights.append(valuation[positions])
+        rows.append(positions)
+    if investor_counts is not None and len(investor_counts):
+        kinds.append(np.ones(len(investor_counts)))
+        labels.append(investor_counts.index.to_numpy(dtype=object))
+        weights.append(investor_counts.to_numpy(dtype=float))
+        rows.append(np.full(len(investor_counts), -1))
+    if 'City' in frame.columns:
+        cities = frame['City'].dropna().astype(str).value_counts()
+        kinds.append(np.full(len(cities), 2))
+        labels.append(cities.index.to_numpy(dtype=object))
+        weights.append(cities.to_numpy(dtype=float))
+        rows.append(np.full(len(cities), -1))
+    if not kinds:
+        return SearchIndex([], [], [], [])
+    return SearchIndex(np.concatenate(kinds), np.concatenate(labels), np.concatenate(weights), np.concatenate(rows))
+
+
+def highlight(text, query):
+    """Split text around the first case-insensitive occurrence of query, for bolding in the UI"""
+    at = str(text).lower().find(str(query or '').strip().lower())
+    if not query or at < 0:
+        return str(text), '', ''
+    end = at + len(str(query).strip())
+    return str(text)[:at], str(text)[at:end], str(text)[end:]
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+import wrangle
+
+
+@pytest.fixture
+def snapshot(monkeypatch, tmp_path):
+    """The loaded snapshot, with updates logged to a scratch directory and the snapshot restored afterwards"""
+    monkeypatch.setattr(wrangle, 'CACHE_DIR', str(tmp_path))
+    data = wrangle.current()
+    if data.chunked:
+        pytest.skip("chunked snapshots append rows instead of replacing them")
+    yield data
+    wrangle.publish(data)
+
+
+def sorted_cells(cube):
+    dims = [col for col in cube.columns if col in wrangle.CUBE_DIMENSIONS]
+    return cube.sort_values(dims, na_position='last', kind='stable').reset_index(drop=True)
+
+
+def assert_matches_rebuild(updated):
+    fresh = wrangle.Dataset(updated.df, updated.version)
+    assert_frame_equal(sorted_cells(updated.cube), sorted_cells(fresh.cube), check_dtype=False)
+    assert_series_equal(updated.investor_index['all'], fresh.investor_index['all'])
+    assert updated.investor_index['by_country'].keys() == fresh.investor_index['by_country'].keys()
+    for country, counts in fresh.investor_index['by_country'].items():
+        assert_series_equal(updated.investor_index['by_country'][country], counts)
+    assert updated.row_index.keys() == fresh.row_index.keys()
+    for col in wrangle.FILTER_COLUMNS:
+        assert updated.row_index[col].keys() == fresh.row_index[col].keys()
+        for value, positions in fresh.row_index[col].items():
+            np.testing.assert_array_equal(updated.row_index[col][value], positions)
+    np.testing.assert_array_equal(updated.row_index['Founded Year'][0], fresh.row_index['Founded Year'][0])
+    np.testing.assert_array_equal(updated.row_index['Founded Year'][1], fresh.row_index['Founded Year'][1])
+
+
+def test_new_row_matches_rebuild(snapshot):
+    wrangle.apply_update([{
+        'Company': 'Zeta Robotics',
+        'Valuation ($B)': '$3',
+        'Date Joined': '5/4/2022',
+        'Country': 'China',
+        'City': 'Shenzhen',
+        'Industry': 'Hardware',
+        'Select Inverstors': 'Baidu, DCM Ventures, Lightspeed Venture Partners',
+        'Founded Year': 2016,
+        'Total Raised': '$400M',
+        'Financial Stage': 'None',
+        'Investors Count': 3
+    }])
+    updated = wrangle.current()
+    assert len(updated.df) == len(snapshot.df) + 1
+    assert_matches_rebuild(updated)
+
+
+def test_replaced_row_matches_rebuild(snapshot):
+    first = snapshot.df.iloc[0]
+    wrangle.apply_update([{
+        'Company': first['Company'],
+        'Valuation ($B)': '$1',
+        'Country': 'India',
+        'Industry': 'Edtech',
+        'Select Inverstors': 'Accel, Tiger Global Management'
+    }])
+    updated = wrangle.current()
+    assert len(updated.df) == len(snapshot.df)
+    assert updated.df.iloc[-1]['Company'] == first['Company']
+    assert_matches_rebuild(updated)
+
+
+def test_update_is_warmed_before_it_is_published(snapshot):
+    wrangle.apply_update([{'Company': 'Eta Health', 'Valuation ($B)': '$2', 'Country': 'France'}])
+    updated = wrangle.current()
+    assert updated.search is not None
+    assert updated.timelines
+    assert set(updated.figures) == set(wrangle.FIGURE_BUILDERS) or wrangle.prebuild_figures not in wrangle.WARMERS
+    assert wrangle.search_names('eta health', data=updated)[0][1] == 'Eta Health'
+
+
+@pytest.mark.parametrize('records', [[{'Valuation ($B)': '$2'}], [{'Company': None}], [{'Company': '  '}]])
+def test_rows_without_a_company_are_rejected(snapshot, records):
+    with pytest.raises(ValueError, match="Company"):
+        wrangle.apply_update(records)
+    assert wrangle.current() is snapshot
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import wrangle
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_frame():
+    """Raw rows with shifted investors, literal "None" values and $K/$M/$B amounts"""
+    return pd.DataFrame({
+        'Company': ['Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon'],
+        'Valuation ($B)': ['$140', '$1.5', None, '$10', '$2'],
+        'Date Joined': ['4/7/2017', '12/1/2021', 'not a date', '1/30/2019', '6/15/2022'],
+        'Country': ['China', 'United States', 'None', 'India', 'Germany'],
+        'City': ['Beijing', 'Fintech', 'Berlin', 'Bengaluru', 'Munich'],
+        'Industry': ['Artificial intelligence', 'Sequoia Capital, Accel', 'Finttech', 'Edtech', 'Fintech'],
+        'Select Inverstors': ['Tencent, SIG', None, 'None', 'Accel', None],
+        'Founded Year': [2012, 2015, np.nan, 2011, 2018],
+        'Total Raised': ['$7.44B', '$500M', '$250K', 'None', '$12'],
+        'Financial Stage': ['IPO', 'Acq', 'None', 'Acquired', None],
+        'Investors Count': [28, np.nan, 3, 1, 2],
+        'Deal Terms': [8, 1, np.nan, 2, 1],
+        'Portfolio Exits': [5, np.nan, 0, 1, np.nan]
+    }, index=[0, 1, 2, 3, 789])
+
+
+def test_clean_frame_matches_reference_on_sample():
+    raw = sample_frame()
+    assert_frame_equal(wrangle.clean_and_process_data(raw.copy()), wrangle.clean_frame(raw))
+
+
+def test_clean_frame_repairs_shifted_rows_except_789():
+    cleaned = wrangle.clean_frame(sample_frame())
+    # a shifted row has its industry under City and its investors under Industry
+    assert pd.isna(cleaned.loc[1, 'City'])
+    assert cleaned.loc[1, 'Industry'] == 'Fintech'
+    assert cleaned.loc[1, 'Select Investors'] == 'Sequoia Capital, Accel'
+    assert cleaned.loc[789, 'City'] == 'Munich'
+    assert pd.isna(cleaned.loc[789, 'Select Investors'])
+
+
+def test_clean_frame_parses_amounts():
+    cleaned = wrangle.clean_frame(sample_frame())
+    assert cleaned['Total Raised(M)'].tolist()[:3] == [7440.0, 500.0, 0.25]
+    assert pd.isna(cleaned.loc[3, 'Total Raised(M)'])
+    assert cleaned.loc[789, 'Total Raised(M)'] == 12e-6
+    assert cleaned.loc[2, 'Valuation ($B)'] == 0
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(ROOT, wrangle.SOURCE_CSV)), reason="source CSV not present")
+def test_clean_frame_matches_reference_on_csv():
+    raw = pd.read_csv(os.path.join(ROOT, wrangle.SOURCE_CSV))
+    assert_frame_equal(wrangle.clean_and_process_data(raw.copy()), wrangle.clean_frame(raw))
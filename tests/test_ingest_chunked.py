@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+import wrangle
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV = os.path.join(ROOT, wrangle.SOURCE_CSV)
+
+pytestmark = pytest.mark.skipif(not os.path.exists(CSV), reason="source CSV not present")
+
+
+@pytest.fixture(scope='module')
+def snapshots():
+    """Full and chunked snapshots of the source CSV, the chunks small enough to fold many times"""
+    full = wrangle.Dataset(wrangle.clean_frame(pd.read_csv(CSV)), 'full')
+    ingested = wrangle.ingest_chunked(CSV, chunksize=97)
+    chunked = wrangle.Dataset(
+        ingested['top_rows'],
+        'chunked',
+        cube=ingested['cube'],
+        investor_index=wrangle.investor_index_from_marginals(ingested['investor_marginals']),
+        chunked=True,
+        timeline_marginals=ingested['timeline_marginals']
+    )
+    return full, chunked
+
+
+def sorted_cells(cube):
+    dims = [col for col in cube.columns if col in wrangle.CUBE_DIMENSIONS]
+    # chunks meet the categories in a different order
+    cube = cube.astype({col: object for col in dims if isinstance(cube[col].dtype, pd.CategoricalDtype)})
+    return cube.sort_values(dims, na_position='last', kind='stable').reset_index(drop=True)
+
+
+def single_dimension_filters():
+    yield None
+    yield {'Country': ('China',)}
+    yield {'Country': ('United States', 'India')}
+    yield {'Industry': ('Fintech',)}
+    yield {'Financial Stage': ('IPO', 'Acquired')}
+    yield {'Founded Year': (2010, 2015)}
+
+
+def test_aggregates_match_full_load(snapshots):
+    full, chunked = snapshots
+    assert_frame_equal(sorted_cells(chunked.cube), sorted_cells(full.cube), check_dtype=False)
+    assert chunked.totals == full.totals
+    assert len(chunked.df) < len(full.df)
+
+
+def test_single_dimension_results_match_full_load(snapshots):
+    full, chunked = snapshots
+    for filters in single_dimension_filters():
+        top = wrangle.select_rows(filters, data=full).nlargest(20, 'Valuation ($B)')
+        kept = wrangle.select_rows(filters, data=chunked).nlargest(20, 'Valuation ($B)')
+        assert kept['Company'].tolist() == top['Company'].tolist()
+
+        counts = wrangle.top_investors(n=10, filters=filters, data=full)
+        kept_counts = wrangle.top_investors(n=10, filters=filters, data=chunked)
+        np.testing.assert_array_equal(kept_counts.to_numpy(), counts.to_numpy())
+
+        expected = wrangle.timeline_for(filters, full)
+        found = wrangle.timeline_for(filters, chunked)
+        assert found.totals() == pytest.approx(expected.totals())
+        np.testing.assert_array_equal(found.age_counts, expected.age_counts)
+
+
+def test_country_investors_match_full_load(snapshots):
+    full, chunked = snapshots
+    for country, counts in full.investor_index['by_country'].items():
+        assert_series_equal(
+            chunked.investor_index['by_country'][country].sort_index(),
+            counts.sort_index(),
+            check_names=False
+        )
+
+
+def test_investor_links_are_reported_unavailable(snapshots):
+    full, chunked = snapshots
+    assert wrangle.investor_links_unavailable(chunked) == "not available in chunked mode"
+    assert wrangle.investor_clusters(data=chunked) == []
+    if wrangle.investor_links_unavailable(full) is None:
+        clusters = wrangle.investor_clusters(data=full)
+        assert wrangle.investor_clusters(limit=3, data=full) == clusters[:3]
@@ -0,0 +1,21 @@
+import search
+
+
+def test_query_ranks_every_match():
+    names = [f"Alpha {i:05d}" for i in range(30_000)] + ['Alpha Zulu']
+    weights = [1.0] * 30_000 + [100.0]
+    index = search.SearchIndex([0] * len(names), names, weights, range(len(names)))
+    assert index.query('a', limit=1) == [('Company', 'Alpha Zulu', 30_000)]
+
+
+def test_query_order():
+    index = search.SearchIndex(
+        [0, 0, 1, 2, 0],
+        ['Sequoia', 'Sequoia Labs', 'Sequoia Capital', 'Seoul', 'Big Sequoia'],
+        [1.0, 5.0, 40.0, 3.0, 9.0],
+        [0, 1, -1, -1, 4]
+    )
+    labels = [label for _, label, _ in index.query('sequoia')]
+    assert labels == ['Sequoia', 'Sequoia Labs', 'Sequoia Capital', 'Big Sequoia']
+    assert [label for _, label, _ in index.query('SEO ')] == ['Seoul']
+    assert index.query('zz') == [] and index.query('  ') == []
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+MONTH = 'Joined Month'
+
+
+def month_numbers(dates):
+    """Months since year 0 of a datetime series, NaN where the date is missing"""
+    dates = pd.to_datetime(dates, errors='coerce')
+    return dates.dt.year * 12 + dates.dt.month - 1
+
+
+def month_labels(months):
+    """'YYYY-MM' labels of month numbers, which plotly reads as dates"""
+    months = np.asarray(months, dtype='int64')
+    return [f"{year:04d}-{month + 1:02d}" for year, month in zip(months // 12, months % 12)]
+
+
+class Timeline:
+    """Unicorns by join month as cumulative arrays, so any date range is two binary searches
+
+    cumulative[i] holds the total over the first i months, a range [lo, hi)
+    of months is cumulative[hi] - cumulative[lo]. Time to unicorn keeps one
+    cumulative histogram row per month the same way.
+    """
+
+    def __init__(self, months, counts, valuations, ages, age_counts):
+        self.months = np.asarray(months, dtype='int64')
+        self.counts = np.concatenate([[0], np.cumsum(counts, dtype='int64')])
+        self.valuations = np.concatenate([[0.0], np.cumsum(valuations, dtype=float)])
+        self.ages = np.asarray(ages, dtype='int64')
+        age_counts = np.asarray(age_counts, dtype='int64').reshape(len(self.months), len(self.ages))
+        self.age_counts = np.vstack([np.zeros((1, len(self.ages)), dtype='int64'), np.cumsum(age_counts, axis=0)])
+
+    def __len__(self):
+        return len(self.months)
+
+    def span(self, start=None, end=None):
+        """Positions [lo, hi) of the months from start to end, both inclusive"""
+        lo = 0 if start is None else int(np.searchsorted(self.months, start, side='left'))
+        hi = len(self.months) if end is None else int(np.searchsorted(self.months, end, side='right'))
+        return lo, max(lo, hi)
+
+    def totals(self, start=None, end=None):
+        """Unicorns joined and their valuation ($B) from start to end"""
+        lo, hi = self.span(start, end)
+        return int(self.counts[hi] - self.counts[lo]), float(self.valuations[hi] - self.valuations[lo])
+
+    def running(self, start=None, end=None):
+        """Months from start to end with the running unicorn count and valuation at each"""
+        lo, hi = self.span(start, end)
+        return self.months[lo:hi], self.counts[lo + 1:hi + 1], self.valuations[lo + 1:hi + 1]
+
+    def time_to_unicorn(self, start=None, end=None):
+        """Companies per whole number of years from founding to joining, for joins from start to end"""
+        lo, hi = self.span(start, end)
+        counts = self.age_counts[hi] - self.age_counts[lo]
+        present = counts > 0
+        return pd.Series(counts[present], index=pd.Index(self.ages[present], name='Years to Unicorn'), name='count')
+
+
+def build_timeline(cells):
+    """Timeline from aggregate cells with a Joined Month, count and valuation column
+
+    Cells with a Founded Year also count towards time to unicorn.
+    """
+    if cells is None or not len(cells):
+        return Timeline([], [], [], [], [])
+    months = cells[MONTH].to_numpy(dtype='int64')
+    month_values, month_codes = np.unique(months, return_inverse=True)
+    counts = np.bincount(month_codes, weights=cells['count'].to_numpy(dtype=float), minlength=len(month_values))
+    valuations = np.bincount(month_codes, weights=cells['valuation'].to_numpy(dtype=float), minlength=len(month_values))
+
+    founded = cells['Founded Year'].to_numpy(dtype=float, na_value=np.nan) if 'Founded Year' in cells.columns \
+        else np.full(len(cells), np.nan)
+    known = ~np.isnan(founded)
+    ages = months[known] // 12 - founded[known].astype('int64')
+    age_values, age_codes = np.unique(ages, return_inverse=True)
+    age_counts = np.zeros((len(month_values), len(age_values)), dtype='int64')
+    np.add.at(age_counts, (month_codes[known], age_codes), cells['count'].to_numpy(dtype='int64')[known])
+    return Timeline(month_values, counts.astype('int64'), valuations, age_values, age_counts)
@@ -2,8 +2,39 @@ import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-import pycountry
 import math
+import os
+import glob
+import hashlib
+import json
+import base64
+import threading
+import time
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+import figure_dicts
+import search
+import timeline
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except ImportError:
+    print("Warning: pyarrow not installed. Cleaned data will not be cached.")
+    pa = pc = feather = None
+try:
+    import fcntl
+except ImportError:
+    print("Warning: fcntl not available. Posted rows are not shared between worker processes.")
+    fcntl = None
+try:
+    import scipy.sparse as sparse
+    from scipy.sparse.csgraph import connected_components
+except ImportError:
+    print("Warning: scipy not installed. Co-investment queries are disabled.")
+    sparse = connected_components = None
 try:
     import fig_layout
     layout_config = fig_layout.my_figlayout
@@ -14,26 +45,8 @@ except ImportError:
         'paper_bgcolor': 'rgba(0,0,0,0)',
         'font': {'color': 'white', 'family': 'Roboto'}
     }
-try:
-    df = pd.read_csv("Unicorn_Companies.csv")
-except FileNotFoundError:
-    print("Warning: Unicorn_Companies.csv not found. Creating dummy data.")
-    df = pd.DataFrame({
-        'Company': ['Company A', 'Company B', 'Company C'] * 300,
-        'Valuation ($B)': ['$1.5', '$2.3', '$3.1'] * 300,
-        'Date Joined': ['1/1/2020', '2/1/2021', '3/1/2022'] * 300,
-        'Country': ['United States', 'China', 'United Kingdom'] * 300,
-        'City': ['San Francisco', 'Beijing', 'London'] * 300,
-        'Industry': ['Fintech', 'E-commerce', 'AI'] * 300,
-        'Select Inverstors': ['Investor A, Investor B', 'Investor C', 'Investor D'] * 300,
-        'Founded Year': [2010, 2015, 2020] * 300,
-        'Total Raised': ['$100M', '$200M', '$300M'] * 300,
-        'Financial Stage': ['Series A', 'Series B', 'IPO'] * 300,
-        'Investors Count': [5, 8, 12] * 300
-    })
-
-def clean_and_process_data():
-    global df
+def clean_and_process_data(df):
+    """Row-wise cleaning pass, kept as the reference for clean_frame"""
     if 'Select Inverstors' in df.columns:
 
         ind_shifted = df[df["Select Inverstors"].isnull()].index.to_list()
@@ -115,39 +128,796 @@ def clean_and_process_data():
     
     if 'Investors Count' in df.columns:
         df["Investors Count"] = df["Investors Count"].astype(int)
+    return add_iso_codes(df)
+
+# names pycountry cannot resolve, or that used to be mapped by hand
+COUNTRY_ALIASES = {
+    'United States': 'USA',
+    'United Kingdom': 'GBR',
+    'South Korea': 'KOR',
+    'Turkey': 'TUR'
+}
+# ISO-3 code (or None) of every country name resolved so far in this process
+_iso_codes = {}
+
+def resolve_iso_codes(countries):
+    """ISO-3 code of each distinct country name, None for names that cannot be resolved
+
+    Each name is looked up once per process and unresolved names are reported.
+    """
+    names = pd.Series(countries).dropna().astype(str).unique()
+    missing = [name for name in names if name not in _iso_codes]
+    if missing:
+        try:
+            import pycountry
+        except ImportError:
+            print("Warning: pycountry not installed. Only COUNTRY_ALIASES will be resolved.")
+            pycountry = None
+        for name in missing:
+            code = COUNTRY_ALIASES.get(name)
+            if code is None and pycountry is not None:
+                try:
+                    code = pycountry.countries.lookup(name).alpha_3
+                except LookupError:
+                    code = None
+            _iso_codes[name] = code
+        unresolved = sorted(name for name in missing if _iso_codes[name] is None)
+        if unresolved:
+            print(f"Warning: no ISO-3 code for countries: {', '.join(unresolved)}")
+    return {name: _iso_codes[name] for name in names}
+
+def add_iso_codes(df):
+    """Add the categorical iso_code column resolved from Country"""
+    if 'Country' in df.columns:
+        codes = resolve_iso_codes(df['Country'])
+        df['iso_code'] = df['Country'].astype(object).map(codes).astype('category')
+    return df
+
+RAISED_UNITS = {'B': 1e9, 'M': 1e6, 'K': 1e3}
+
+def clean_frame(frame, unshifted_rows=(789,), repair_shift=True):
+    """Vectorized cleaning pass, returns the same frame as clean_and_process_data
+
+    repair_shift=False skips the shifted-row repair of the Kaggle file, for
+    rows that did not come from it.
+    """
+    df = frame.copy()
+    if repair_shift and 'Select Inverstors' in df.columns:
+        # rows with no investors were shifted one column to the right, except the
+        # unshifted_rows labels (row 789 of the Kaggle file) which just have none
+        shifted = df["Select Inverstors"].isnull() & ~df.index.isin(unshifted_rows)
+        if shifted.any():
+            rotated = df.loc[shifted, ["Select Inverstors", "City", "Industry"]].to_numpy()
+            df.loc[shifted, ["City", "Industry", "Select Inverstors"]] = rotated
+    if 'Valuation ($B)' in df.columns:
+        valuation = df["Valuation ($B)"]
+        numbers = pd.to_numeric(valuation.astype(str).str.replace('$', '', regex=False))
+        df["Valuation ($B)"] = numbers.where(valuation.notna(), 0).astype(float)
+    if 'Date Joined' in df.columns:
+        df["Date Joined"] = pd.to_datetime(df["Date Joined"], errors='coerce')
+
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        df[col] = df[col].mask(df[col] == "None")
+
+    if 'Investors Count' in df.columns:
+        df["Investors Count"] = df["Investors Count"].fillna(0)
+    if 'Total Raised' in df.columns:
+        raised = df["Total Raised"]
+        text = raised.astype(str)
+        amount = pd.to_numeric(text.str.replace(r'[^\d.]', '', regex=True), errors='coerce').fillna(0)
+        unit = text.str[-1].str.upper().map(RAISED_UNITS).fillna(1).astype(float)
+        df["Total Raised"] = (amount * unit).where(raised.notna()) / 1e6
+
+    df = df.rename(columns={
+        "Total Raised": "Total Raised(M)",
+        "Select Inverstors": "Select Investors"
+    })
+
+    if 'Financial Stage' in df.columns:
+        df['Financial Stage'] = df['Financial Stage'].replace({"Acq": "Acquired"})
+    if 'Industry' in df.columns:
+        df["Industry"] = df["Industry"].replace({
+            "Finttech": "Fintech",
+            "Artificial intelligence": "Artificial Intelligence"
+        })
+
+    for col in ['Country', 'City', 'Industry']:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if 'Investors Count' in df.columns:
+        df["Investors Count"] = df["Investors Count"].astype(int)
+    return add_iso_codes(df)
+
+SOURCE_CSV = "Unicorn_Companies.csv"
+# columns of the source CSV, the schema rows posted to apply_update use too
+RAW_COLUMNS = [
+    'Company', 'Valuation ($B)', 'Date Joined', 'Country', 'City', 'Industry',
+    'Select Inverstors', 'Founded Year', 'Total Raised', 'Financial Stage',
+    'Investors Count', 'Deal Terms', 'Portfolio Exits'
+]
+CACHE_DIR = os.environ.get("UNICORN_CACHE_DIR", ".cache")
+# bump whenever clean_frame changes its output so old snapshots are not reused
+CACHE_FORMAT = 2
+
+def source_key(path):
+    """Identify a version of the source CSV from its path, size and mtime"""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}:{CACHE_FORMAT}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def load_dataset(path=SOURCE_CSV):
+    """Load the cleaned frame, reusing the Feather snapshot while the CSV is unchanged"""
+    key = source_key(path)
+    snapshot = os.path.join(CACHE_DIR, f"unicorns-{key}.feather")
+    if feather is not None and os.path.exists(snapshot):
+        try:
+            # to_pandas copies every column into numpy/str blocks, which the cleaned schema expects
+            return feather.read_feather(snapshot)
+        except Exception as e:
+            print(f"Warning: could not read cached data {snapshot}: {e}")
+
+    frame = clean_frame(pd.read_csv(path))
+    if feather is not None:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f"{snapshot}.{os.getpid()}.tmp"
+            feather.write_feather(frame, tmp_path)
+            os.replace(tmp_path, snapshot)
+            for stale in glob.glob(os.path.join(CACHE_DIR, "unicorns-*.feather")):
+                if stale != snapshot:
+                    os.remove(stale)
+            # rows posted on top of an older CSV are dropped with it
+            for stale in glob.glob(os.path.join(CACHE_DIR, "updates-*.jsonl")):
+                if stale != updates_path(key):
+                    os.remove(stale)
+        except Exception as e:
+            print(f"Warning: could not write cached data {snapshot}: {e}")
+    return frame
+
+# set UNICORN_COMPACT=1 to keep the cleaned frame in the compact schema of compact_frame
+COMPACT_SCHEMA = os.environ.get("UNICORN_COMPACT", "") not in ("", "0")
+
+def investor_lists(investors):
+    """Dictionary-encoded Arrow list column from the comma separated investor strings"""
+    lists = pc.split_pattern(pa.array(investors, type=pa.string(), from_pandas=True), ', ')
+    if isinstance(lists, pa.ChunkedArray):
+        lists = lists.combine_chunks()
+    encoded = pa.ListArray.from_arrays(lists.offsets, lists.flatten().dictionary_encode(), mask=lists.is_null())
+    return pd.Series(pd.arrays.ArrowExtensionArray(encoded), index=investors.index, name=investors.name)
+
+def compact_frame(frame):
+    """Shrink the cleaned frame with categories, Arrow strings, small nullable ints and encoded investor lists
+
+    Valuation and Total Raised stay float64 so totals and hover values do not change.
+    """
+    compact = frame.copy()
+    for col in ['Country', 'City', 'Industry', 'Financial Stage']:
+        if col in compact.columns and not isinstance(compact[col].dtype, pd.CategoricalDtype):
+            compact[col] = compact[col].astype('category')
+    for col in ['Founded Year', 'Investors Count', 'Deal Terms', 'Portfolio Exits']:
+        if col in compact.columns and pd.api.types.is_numeric_dtype(compact[col]):
+            values = compact[col].dropna()
+            if (values % 1 == 0).all():
+                compact[col] = pd.to_numeric(compact[col].astype('Int64'), downcast='integer')
+    if pa is not None:
+        if 'Company' in compact.columns and compact['Company'].dtype == object:
+            compact['Company'] = compact['Company'].astype('string[pyarrow]')
+        if 'Select Investors' in compact.columns:
+            compact['Select Investors'] = investor_lists(compact['Select Investors'])
+    return compact
+
+def memory_report(before, after):
+    """Per-column memory in bytes of a frame before and after compact_frame"""
+    report = pd.DataFrame({
+        'before': before.memory_usage(deep=True, index=False),
+        'after': after.memory_usage(deep=True, index=False)
+    })
+    report.loc['total'] = report.sum()
+    return report
+
+def explode_investors(frame):
+    """Every (row position, investor) pair of Select Investors, in row order"""
+    investors = frame['Select Investors'].reset_index(drop=True)
+    if isinstance(investors.dtype, pd.ArrowDtype):
+        lengths = investors.list.len().fillna(0).to_numpy(dtype='int64')
+        rows = np.repeat(np.arange(len(investors), dtype='int64'), lengths)
+        names = investors.list.flatten().astype(str).to_numpy()
+    else:
+        exploded = investors.dropna().astype(str).str.split(', ').explode()
+        rows, names = exploded.index.to_numpy(dtype='int64'), exploded.to_numpy()
+    return pd.DataFrame({'row': rows, 'Investor': names})
+
+CUBE_DIMENSIONS = ['Country', 'Industry', 'Founded Year', 'Financial Stage']
+
+def build_cube(frame):
+    """Pre-aggregate count, valuation and raised over country/industry/founded year/stage"""
+    dims = [col for col in CUBE_DIMENSIONS if col in frame.columns]
+    return frame.groupby(dims, observed=True, dropna=False, sort=False).agg(
+        count=('Valuation ($B)', 'size'),
+        valuation=('Valuation ($B)', 'sum'),
+        raised=('Total Raised(M)', 'sum')
+    ).reset_index()
+
+def build_investor_marginals(frame):
+    """Count investor appearances per value of each cube dimension, as {dimension: table}"""
+    dims = [col for col in CUBE_DIMENSIONS if col in frame.columns]
+    pairs = explode_investors(frame)
+    exploded = frame[dims].take(pairs['row'].to_numpy()).assign(Investor=pairs['Investor'].to_numpy())
+    return {
+        dim: exploded.groupby([dim, 'Investor'], observed=True, dropna=False, sort=False).size().rename('count').reset_index()
+        for dim in dims
+    }
+
+def _dated_rows(frame, dims):
+    months = timeline.month_numbers(frame['Date Joined'])
+    dated = frame[dims + ['Valuation ($B)']].assign(**{timeline.MONTH: months})[months.notna().to_numpy()]
+    dated[timeline.MONTH] = dated[timeline.MONTH].astype('int64')
+    return dated
+
+def _month_cells(dated, dims):
+    return dated.groupby(dims + [timeline.MONTH], observed=True, dropna=False, sort=False).agg(
+        count=('Valuation ($B)', 'size'),
+        valuation=('Valuation ($B)', 'sum')
+    ).reset_index()
+
+def build_timeline_cube(frame):
+    """Pre-aggregate count and valuation over the cube dimensions and the month each company joined"""
+    if 'Date Joined' not in frame.columns:
+        return None
+    dims = [col for col in CUBE_DIMENSIONS if col in frame.columns]
+    return _month_cells(_dated_rows(frame, dims), dims)
+
+def build_timeline_marginals(frame):
+    """Join-month count and valuation per value of each cube dimension, as {dimension: table}
+
+    Every table is also split by founded year, which time to unicorn needs.
+    """
+    if 'Date Joined' not in frame.columns:
+        return None
+    dims = [col for col in CUBE_DIMENSIONS if col in frame.columns]
+    dated = _dated_rows(frame, dims)
+    years = ['Founded Year'] if 'Founded Year' in dims else []
+    return {dim: _month_cells(dated, list(dict.fromkeys([dim] + years))) for dim in dims}
+
+def concat_rows(frames, ignore_index=False):
+    """Concatenate frames, unioning categories so categorical columns stay categorical"""
+    frames = [frame for frame in frames if frame is not None]
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            categories = frames[0][col].cat.categories
+            for frame in frames[1:]:
+                categories = categories.append(pd.Index(frame[col].dropna().unique()).difference(categories))
+            dtype = pd.CategoricalDtype(categories)
+            frames = [frame.assign(**{col: frame[col].astype(dtype)}) for frame in frames]
+    return pd.concat(frames, ignore_index=ignore_index)
+
+def merge_cubes(parts):
+    """Fold partial cubes into one by summing their measures cell by cell"""
+    merged = concat_rows(parts, ignore_index=True)
+    dims = [col for col in merged.columns if col in CUBE_DIMENSIONS or col in ('Investor', timeline.MONTH)]
+    return merged.groupby(dims, observed=True, dropna=False, sort=False).sum().reset_index()
+
+def merge_marginals(parts):
+    """merge_cubes for every dimension of partial {dimension: table} marginals"""
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return None
+    return {dim: merge_cubes([part[dim] for part in parts]) for dim in parts[0]}
+
+def fold_marginals(marginals, added):
+    """fold_cells for every dimension of {dimension: table} marginals"""
+    if marginals is None or added is None:
+        return marginals
+    return {dim: fold_cells(table, added[dim]) for dim, table in marginals.items()}
+
+@metrics.timed('filter')
+def marginal_cells(marginals, filters, cube):
+    """Rows of the marginal table that best answers filters
+
+    A table applies the filters on the columns it has, so filters on a single
+    dimension (any number of its values, or a year range) are answered
+    exactly. Otherwise the table selecting the fewest companies in cube is
+    used and the other filters are ignored, so the result is approximate.
+    """
+    def applied(dim):
+        return {col: values for col, values in filters.items() if col in marginals[dim].columns}
+
+    dims = [col for col in (filters or {}) if col in marginals]
+    if not dims:
+        # every marginal sums to the same totals
+        return next(iter(marginals.values()))
+    dim = min(dims, key=lambda col: filter_cells(cube, applied(col))['count'].sum())
+    return filter_cells(marginals[dim], applied(dim))
+
+# most valuable companies kept overall and per value of each cube dimension, enough
+# for the top 20 scatter under a filter on one dimension
+TOP_ROWS_PER_VALUE = 20
+
+def keep_top_rows(frame):
+    """Keep the TOP_ROWS_PER_VALUE most valuable companies overall and of every value of each cube dimension"""
+    dims = [col for col in CUBE_DIMENSIONS if col in frame.columns]
+    ranked = frame.sort_values("Valuation ($B)", ascending=False, kind='stable')
+    keep = [ranked.index[:TOP_ROWS_PER_VALUE]]
+    for dim in dims:
+        keep.append(ranked.groupby(dim, observed=True, sort=False).head(TOP_ROWS_PER_VALUE).index)
+    return frame.loc[np.unique(np.concatenate(keep))]
+
+def _part_rows(part):
+    return sum(len(table) for table in part.values()) if isinstance(part, dict) else len(part)
+
+def _fold_parts(merged, pending, fold, force=False):
+    # fold the pending parts in only once they outgrow what is already merged, so
+    # every row is regrouped O(log chunks) times instead of once per chunk
+    pending = [part for part in pending if part is not None]
+    if not pending or (not force and sum(map(_part_rows, pending)) < (_part_rows(merged) if merged is not None else 0)):
+        return merged, pending
+    return fold([merged] + pending), []
+
+def ingest_chunked(path, chunksize=100_000):
+    """Clean the CSV chunk by chunk, folding every chunk into the dashboard aggregates
+
+    Kept are the cube, the investor and join-month counts per value of each
+    cube dimension (marginals) and the TOP_ROWS_PER_VALUE most valuable rows
+    overall and per value, never the whole file. Besides the cube, whose
+    cells are combinations of the four dimensions as in a full load, that
+    state grows with the number of distinct values, investors and months,
+    not with the rows, so peak memory is about one cleaned chunk on top of
+    the cube.
+
+    The price is precision: KPIs and the rollups of the cube stay exact, as
+    do the scatter, investor and timeline results under filters on a single
+    dimension. Filtered on several dimensions they use only the most
+    selective one (see marginal_cells), and the scatter picks from the kept
+    rows, so cross-filtered results are approximate.
+    """
+    builders = {
+        'cube': (build_cube, merge_cubes),
+        'investor_marginals': (build_investor_marginals, merge_marginals),
+        'timeline_marginals': (build_timeline_marginals, merge_marginals),
+        'top_rows': (keep_top_rows, lambda parts: keep_top_rows(concat_rows(parts)))
+    }
+    state = {name: (None, []) for name in builders}
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        # chunks keep their file row labels, so clean_frame still skips row 789
+        chunk = clean_frame(chunk)
+        for name, (build, fold) in builders.items():
+            merged, pending = state[name]
+            state[name] = _fold_parts(merged, pending + [build(chunk)], fold)
+    return {
+        name: _fold_parts(*state[name], builders[name][1], force=True)[0]
+        for name in builders
+    }
+
+# set UNICORN_CHUNKSIZE to ingest the CSV in chunks and keep only the aggregates
+INGEST_CHUNKSIZE = int(os.environ.get("UNICORN_CHUNKSIZE", 0))
+
+def dummy_frame():
+    """Raw sample rows used when the CSV is missing"""
+    return pd.DataFrame({
+        'Company': ['Company A', 'Company B', 'Company C'] * 300,
+        'Valuation ($B)': ['$1.5', '$2.3', '$3.1'] * 300,
+        'Date Joined': ['1/1/2020', '2/1/2021', '3/1/2022'] * 300,
+        'Country': ['United States', 'China', 'United Kingdom'] * 300,
+        'City': ['San Francisco', 'Beijing', 'London'] * 300,
+        'Industry': ['Fintech', 'E-commerce', 'AI'] * 300,
+        'Select Inverstors': ['Investor A, Investor B', 'Investor C', 'Investor D'] * 300,
+        'Founded Year': [2010, 2015, 2020] * 300,
+        'Total Raised': ['$100M', '$200M', '$300M'] * 300,
+        'Financial Stage': ['Series A', 'Series B', 'IPO'] * 300,
+        'Investors Count': [5, 8, 12] * 300
+    })
+
+def build_investor_index(frame):
+    """Build the exploded investor/company table and per-country investor counts"""
+    pairs = pd.DataFrame({'row': pd.Series(dtype='int64'), 'Investor': pd.Series(dtype='object')})
+    if 'Select Investors' in frame.columns:
+        pairs = explode_investors(frame)
+    if 'Country' in frame.columns:
+        pairs['Country'] = frame['Country'].take(pairs['row'].to_numpy()).reset_index(drop=True)
+
+    by_country = {}
+    if 'Country' in pairs.columns:
+        # groups keep row order, so ties rank the same as a value_counts over the filtered rows
+        for country, group in pairs.groupby('Country', observed=True, sort=False):
+            by_country[country] = group['Investor'].value_counts()
+
+    codes, names = pd.factorize(pairs['Investor'])
+    return {
+        'pairs': pairs,
+        'all': pairs['Investor'].value_counts(),
+        'by_country': by_country,
+        'codes': codes,
+        'names': names,
+        **investor_incidence(codes, pairs['row'].to_numpy(), len(names), len(frame))
+    }
+
+def investor_incidence(codes, rows, n_investors, n_rows):
+    """Sparse 0/1 investor x company matrix, plus its transpose, both CSR"""
+    if sparse is None:
+        return {}
+    incidence = sparse.csr_matrix(
+        (np.ones(len(codes), dtype='int32'), (codes, rows)),
+        shape=(n_investors, n_rows)
+    )
+    # an investor listed twice for one company still counts once
+    incidence.data[:] = 1
+    return {'incidence': incidence, 'incidence_t': incidence.T.tocsr()}
+
+def investor_index_from_marginals(marginals):
+    """Build the overall and per-country investor counts from investor marginals, without row pairs"""
+    def ranked(cells):
+        return cells.groupby('Investor', sort=False)['count'].sum().sort_values(ascending=False, kind='stable')
+
+    return {
+        'marginals': marginals,
+        'all': ranked(next(iter(marginals.values()))) if marginals else pd.Series(dtype='int64'),
+        'by_country': {
+            country: ranked(group)
+            for country, group in marginals['Country'].groupby('Country', observed=True, sort=False)
+        } if 'Country' in marginals else {}
+    }
+
+@metrics.timed('aggregate')
+def top_investors(country=None, n=10, filters=None, data=None):
+    """Return the n most frequent investors, overall or for a single country
+
+    In chunked mode the counts under filters on several dimensions are
+    approximate, see marginal_cells.
+    """
+    data = data or current()
+    investor_index = data.investor_index
+    if filters:
+        if country is not None:
+            filters = narrow_filters(filters, 'Country', country)
+            if filters is None:
+                return pd.Series(dtype='int64')
+        if 'pairs' not in investor_index:
+            cells = marginal_cells(investor_index['marginals'], filters, data.cube)
+            counts = cells.groupby('Investor', sort=False)['count'].sum()
+            counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+            return counts.iloc[:n]
+        selected = np.zeros(len(data.df), dtype=bool)
+        selected[filter_rows(filters, data)] = True
+        codes = investor_index['codes'][selected[investor_index['pairs']['row'].to_numpy()]]
+        counts = np.bincount(codes, minlength=len(investor_index['names']))
+        top = np.argsort(-counts, kind='stable')[:n]
+        top = top[counts[top] > 0]
+        return pd.Series(counts[top], index=investor_index['names'][top])
+
+    warm = data.variants['country_investors'].get(country) if country is not None and n <= WARM_TOP_N else None
+    if warm is not None:
+        names, counts = warm
+        return pd.Series(counts[:n].astype('int64'), index=pd.Index(names[:n], name='Investor'), name='count')
+    if country is None:
+        counts = investor_index['all']
+    else:
+        counts = investor_index['by_country'].get(country)
+        if counts is None:
+            return pd.Series(dtype='int64')
+    return counts.iloc[:n]
+
+def _investor_code(investor, investor_index):
+    if 'incidence' not in investor_index:
+        return -1
+    return int(investor_index['names'].get_indexer([investor])[0])
+
+@metrics.timed('aggregate')
+def co_investors(investor, n=10, filters=None, data=None):
+    """Investors sharing the most companies with investor, within the filtered rows
+
+    The investor's company row of the incidence matrix times its transpose
+    gives the shared-company count of every other investor in one sparse product.
+    Empty when the investor is unknown, in chunked mode or without scipy.
+    """
+    data = data or current()
+    investor_index = data.investor_index
+    code = _investor_code(investor, investor_index)
+    if code < 0:
+        return pd.Series(dtype='int64', name='shared')
+    companies = investor_index['incidence'][code]
+    if filters:
+        selected = np.zeros(companies.shape[1], dtype=bool)
+        selected[filter_rows(filters, data)] = True
+        companies = companies.multiply(selected.reshape(1, -1)).tocsr()
+    shared = (companies @ investor_index['incidence_t']).toarray().ravel()
+    shared[code] = 0
+    top = np.argsort(-shared, kind='stable')[:n]
+    top = top[shared[top] > 0]
+    return pd.Series(shared[top].astype('int64'), index=investor_index['names'][top], name='shared')
+
+@metrics.timed('aggregate')
+def investor_clusters(filters=None, min_shared=2, min_size=2, limit=None, data=None):
+    """Groups of investors linked by at least min_shared co-investments in the filtered rows
+
+    Co-occurrence is the sparse product of the filtered incidence matrix with
+    its transpose; clusters are its connected components, largest first, each
+    listing its investors by deal count. Filtering on a country or an industry
+    gives the clusters within it. At most limit clusters are listed.
+    Empty in chunked mode or without scipy, see investor_links_unavailable.
+    """
+    data = data or current()
+    investor_index = data.investor_index
+    if 'incidence' not in investor_index:
+        return []
+    rows = investor_index['incidence_t']
+    if filters:
+        rows = rows[filter_rows(filters, data)]
+    active = np.flatnonzero(np.diff(rows.tocsc().indptr))
+    rows = rows[:, active]
+    shared = (rows.T @ rows).tocsr()
+    shared.setdiag(0)
+    shared.data[shared.data < min_shared] = 0
+    shared.eliminate_zeros()
+    _, labels = connected_components(shared, directed=False)
+    sizes = np.bincount(labels)
+    # investors grouped by component in one sort, each component in index order
+    grouped = np.argsort(labels, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    names = investor_index['names'][active]
+    deals = investor_index['all'].reindex(names).fillna(0).to_numpy()
+    clusters = []
+    for label in np.argsort(-sizes, kind='stable'):
+        if sizes[label] < min_size or (limit is not None and len(clusters) >= limit):
+            break
+        members = grouped[bounds[label]:bounds[label + 1]]
+        clusters.append(list(names[members[np.argsort(-deals[members], kind='stable')]]))
+    return clusters
+
+def investor_links_unavailable(data=None):
+    """Why co_investors and investor_clusters come back empty whatever the selection, None when they work"""
+    data = data or current()
+    if data.chunked:
+        return "not available in chunked mode"
+    if 'incidence' not in data.investor_index:
+        return "not available without scipy"
+    return None
+
+@metrics.timed('filter')
+def make_filters(countries=None, industries=None, stages=None, years=None, data=None):
+    """Normalize cross-filter selections, returns None when nothing is filtered
+
+    Categorical filters become tuples of accepted values and years an inclusive
+    (low, high) tuple, so the result can be used as a cache key.
+    """
+    year_bounds = (data or current()).year_bounds
+    filters = {}
+    for col, values in (('Country', countries), ('Industry', industries), ('Financial Stage', stages)):
+        if values:
+            filters[col] = tuple(values)
+    if years and (years[0] > year_bounds[0] or years[1] < year_bounds[1]):
+        filters['Founded Year'] = (years[0], years[1])
+    return filters or None
+
+def narrow_filters(filters, col, value):
+    """Add a single-value selection on col, None if filters already exclude it"""
+    narrowed = dict(filters or {})
+    if col in narrowed and value not in narrowed[col]:
+        return None
+    narrowed[col] = (value,)
+    return narrowed
+
+def restrict_years(filters, low, high):
+    """Intersect the founded year filter with [low, high], None if nothing is left"""
+    narrowed = dict(filters or {})
+    if 'Founded Year' in narrowed:
+        low = max(low, narrowed['Founded Year'][0])
+        high = min(high, narrowed['Founded Year'][1])
+    if low > high:
+        return None
+    narrowed['Founded Year'] = (low, high)
+    return narrowed
+
+@metrics.timed('filter')
+def filter_cells(cells, filters):
+    """Rows of an aggregate table whose dimensions match filters"""
+    if not filters:
+        return cells
+    mask = np.ones(len(cells), dtype=bool)
+    for col, values in filters.items():
+        if col == 'Founded Year':
+            mask &= cells[col].between(values[0], values[1]).to_numpy(dtype=bool, na_value=False)
+        else:
+            mask &= cells[col].isin(values).to_numpy(dtype=bool, na_value=False)
+    return cells[mask]
+
+def cube_cells(filters=None, data=None):
+    """Cube cells matching filters"""
+    return filter_cells((data or current()).cube, filters)
 
+@metrics.timed('aggregate')
+def rollup(by, measure, filters=None, data=None):
+    """Sum a cube measure by one dimension, keeping only cells that match filters"""
+    return cube_cells(filters, data).groupby(by, observed=True)[measure].sum()
 
-clean_and_process_data()
+@metrics.timed('aggregate')
+def kpi_totals(filters=None, data=None):
+    """Total valuation ($B, rounded up to thousands), unicorn count and funding ($B)"""
+    cells = cube_cells(filters, data)
+    valuation = math.ceil(cells['valuation'].sum() * 10**-3) if len(cells) > 0 else 0
+    return valuation, int(cells['count'].sum()), round(cells['raised'].sum() * 10**-3, 2)
 
-def create_top_investors_chart():
+@metrics.timed('aggregate')
+def founded_year_counts(industry, filters=None, data=None):
+    """Number of companies founded per year in one industry, sorted by year"""
+    data = data or current()
+    warm = None if filters else data.variants['industry_years'].get(industry)
+    if warm is not None:
+        years, counts = warm
+        return pd.Series(counts.astype('int64'), index=pd.Index(years.astype(int), name='Founded Year'), name='count')
+    filters = narrow_filters(filters, 'Industry', industry)
+    if filters is None:
+        return pd.Series(dtype='int64')
+    counts = rollup('Founded Year', 'count', filters, data)
+    counts.index = counts.index.astype(int)
+    return counts.sort_index()
+
+# payload budgets: past them figures are aggregated on the server before they are sent
+MAX_BARS = int(os.environ.get("UNICORN_MAX_BARS", 20))
+MAX_POINTS = int(os.environ.get("UNICORN_MAX_POINTS", 200))
+OTHER_LABEL = 'Other (click to expand)'
+
+def top_k_with_other(series, k=None, offset=0):
+    """The k-1 largest values after skipping offset, the remainder summed into one OTHER_LABEL entry"""
+    k = k or MAX_BARS
+    ranked = series.sort_values(ascending=False, kind='stable').iloc[offset:]
+    if len(ranked) <= k:
+        return ranked
+    head = ranked.iloc[:k - 1]
+    other = pd.Series([ranked.iloc[k - 1:].sum()], index=[OTHER_LABEL])
+    return pd.concat([pd.Series(head.to_numpy(), index=head.index.astype(object)), other])
+
+def bin_series(series, max_points=None):
+    """Sum a series with an integer index into equal-width bins, returns (binned, width)
+
+    The series is returned unchanged with width 1 when it fits in max_points.
+    """
+    max_points = max_points or MAX_POINTS
+    if len(series) <= max_points:
+        return series, 1
+    start = int(series.index.min())
+    width = math.ceil((int(series.index.max()) - start + 1) / max_points)
+    bins = start + (series.index.to_numpy() - start) // width * width
+    return series.groupby(bins).sum(), width
+
+def encode_array(values, dtype):
+    """Little-endian typed-array encoding of values, the same shape plotly uses for figure data"""
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': np.dtype(dtype).name, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+def client_payload(filters=None, data=None):
+    """Columnar aggregates behind the industry-years and country-investors charts, for the browser
+
+    Category names are sent once as dictionaries and referenced by integer
+    codes; counts and years travel as base64 typed arrays. Investor rows are
+    the top 10 per country (country code -1 for all countries), already in
+    the ascending order the chart draws them.
+    """
+    data = data or current()
+    cells = cube_cells(filters, data)
+
+    years = cells.groupby(['Industry', 'Founded Year'], observed=True)['count'].sum()
+    industry_codes, industry_names = pd.factorize(years.index.get_level_values('Industry'))
+
+    countries = sorted(str(country) for country in cells['Country'].dropna().unique()) if 'Country' in cells else []
+    country_codes, investor_names, counts = [], [], []
+    for code, country in [(-1, None)] + list(enumerate(countries)):
+        top = top_investors(country, n=10, filters=filters, data=data).sort_values(ascending=True)
+        country_codes.extend([code] * len(top))
+        investor_names.extend(str(name) for name in top.index)
+        counts.extend(top.to_numpy(dtype='int64'))
+    investor_codes, investors = pd.factorize(pd.Index(investor_names, dtype=object))
+
+    return {
+        'industries': [str(name) for name in industry_names],
+        'iy_industry': encode_array(industry_codes, 'int16'),
+        'iy_year': encode_array(years.index.get_level_values('Founded Year').astype(int), 'int16'),
+        'iy_count': encode_array(years.to_numpy(), 'int32'),
+        'countries': countries,
+        'investors': list(investors),
+        'ci_country': encode_array(country_codes, 'int16'),
+        'ci_investor': encode_array(investor_codes, 'int32'),
+        'ci_count': encode_array(counts, 'int32'),
+        'max_points': MAX_POINTS
+    }
+
+FILTER_COLUMNS = ['Country', 'Industry', 'Financial Stage']
+
+def build_row_index(frame):
+    """Sorted row positions per value of each filter column, plus rows ordered by founded year"""
+    index = {}
+    for col in FILTER_COLUMNS:
+        if col not in frame.columns:
+            continue
+        codes, values = pd.factorize(frame[col])
+        order = np.argsort(codes, kind='stable')
+        # missing values get code -1 and sort first, they are never selectable
+        bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        index[col] = {value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(values)}
+    if 'Founded Year' in frame.columns:
+        years = frame['Founded Year'].to_numpy(dtype=float, na_value=np.nan)
+        order = np.argsort(years, kind='stable')
+        index['Founded Year'] = (years[order], order)
+    return index
+
+def compute_year_bounds(cube):
+    """Earliest and latest founded year in the cube"""
+    founded = cube['Founded Year'].dropna() if 'Founded Year' in cube.columns else pd.Series(dtype=float)
+    return (int(founded.min()), int(founded.max())) if len(founded) else (0, 0)
+
+@metrics.timed('filter')
+def filter_rows(filters, data=None):
+    """Sorted positions of the rows matching every filter"""
+    data = data or current()
+    row_index = data.row_index
+    selected = np.ones(len(data.df), dtype=bool)
+    for col, values in filters.items():
+        matched = np.zeros(len(data.df), dtype=bool)
+        if col == 'Founded Year':
+            years, order = row_index[col]
+            low = np.searchsorted(years, values[0], side='left')
+            high = np.searchsorted(years, values[1], side='right')
+            matched[order[low:high]] = True
+        else:
+            for value in values:
+                positions = row_index[col].get(value)
+                if positions is not None:
+                    matched[positions] = True
+        selected &= matched
+    return np.flatnonzero(selected)
+
+@metrics.timed('filter')
+def select_rows(filters=None, columns=None, data=None):
+    """Read-only rows matching filters, restricted to columns
+
+    Only the selected positions of the requested columns are materialized,
+    the snapshot frame itself is never copied.
+    """
+    data = data or current()
+    frame = data.df if columns is None else data.df[list(columns)]
+    if not filters:
+        return frame
+    return frame.take(filter_rows(filters, data))
+
+def filter_options(data=None):
+    """Values offered by each cross-filter dropdown"""
+    cube = (data or current()).cube
+    return {col: sorted(cube[col].dropna().unique()) for col in FILTER_COLUMNS if col in cube.columns}
+
+# layout updates of the dict-built charts, see chart_layout
+CHART_LAYOUTS = {
+    'top_investors': (
+        dict(title='Top 10 Investors', xaxis_title='Unicorns count', yaxis_title='Investors'),
+        layout_config
+    ),
+    'industry': (
+        dict(title={
+            'text': 'Industries distribution by total valuation',
+            'font': {'family': 'Roboto_font', 'color': 'white', 'size': 26}
+        }),
+        layout_config
+    )
+}
+
+@functools.lru_cache(maxsize=None)
+def chart_layout(name):
+    """Preset layout of a dict-built chart, validated on first use instead of at import or on every build"""
+    return figure_dicts.preset_layout(*CHART_LAYOUTS[name])
+
+@metrics.instrument('create_top_investors_chart')
+def create_top_investors_chart(filters=None, data=None):
     """Create top 10 investors bar chart"""
-    investors = []
-    
-    if 'Select Investors' in df.columns:
-        for i, row in df.iterrows():
-            if pd.notna(row["Select Investors"]):
-                investors.extend(str(row["Select Investors"]).split(', '))
+    investors_series = top_investors(filters=filters, data=data)
     
-    if investors:
-        investors_series = pd.Series(investors).value_counts()[:10]
-        investors_series.sort_values(ascending=True, inplace=True)
+    if len(investors_series):
+        investors_series = investors_series.sort_values(ascending=True)
         
-        fig = go.Figure([
-            go.Bar(
-                x=investors_series.values, 
-                y=investors_series.index, 
-                orientation='h',
-                marker=dict(color='#3DED97')
-            )
-        ])
-        
-        fig.update_layout(
-            title='Top 10 Investors',
-            xaxis_title='Unicorns count',
-            yaxis_title='Investors'
-        )
-        fig.update_layout(layout_config)
-        return fig
+        return figure_dicts.figure([{
+            'type': 'bar',
+            'x': figure_dicts.numbers(investors_series.values),
+            'y': figure_dicts.labels(investors_series.index),
+            'orientation': 'h',
+            'marker': {'color': '#3DED97'}
+        }], chart_layout('top_investors'))
     else:
         fig = go.Figure()
         fig.add_annotation(
@@ -157,12 +927,19 @@ def create_top_investors_chart():
         )
         return fig
 
-def create_top_companies_scatter():
+@metrics.instrument('create_top_companies_scatter')
+def create_top_companies_scatter(filters=None, data=None):
     """Create top 20 companies scatter plot"""
-    if len(df) == 0:
+    data = data or current()
+    rows = select_rows(
+        filters,
+        ["Company", "Valuation ($B)", "Total Raised(M)", "Investors Count", "Industry"],
+        data
+    )
+    if len(rows) == 0:
         return go.Figure()
     
-    top_20_companies = df.nlargest(20, "Valuation ($B)")
+    top_20_companies = rows.nlargest(20, "Valuation ($B)")
     
     fig = px.scatter(
         top_20_companies, 
@@ -198,30 +975,21 @@ def create_top_companies_scatter():
     fig.update_layout(layout_config)
     return fig
 
-def create_world_map():
+@metrics.instrument('create_world_map')
+def create_world_map(filters=None, data=None):
     """Create world map of top 10 countries"""
     try:
-        top_10_countries = df.groupby("Country")["Valuation ($B)"].sum().nlargest(10).reset_index()
+        top_10_countries = rollup("Country", "valuation", filters, data).nlargest(10).rename("Valuation ($B)").reset_index()
         
         if len(top_10_countries) == 0:
             return go.Figure()
         
         top_10_countries_total_valuation = top_10_countries["Valuation ($B)"].sum()
-        total_valuation_all = df["Valuation ($B)"].sum()
+        total_valuation_all = cube_cells(filters, data)["valuation"].sum()
         top_10_countries_total_valuation_perc = (top_10_countries_total_valuation * 100 / total_valuation_all) if total_valuation_all > 0 else 0
         
-        def get_iso_code(country_name):
-            try:
-                return pycountry.countries.lookup(country_name).alpha_3
-            except:
-                country_mapping = {
-                    'United States': 'USA',
-                    'United Kingdom': 'GBR',
-                    'South Korea': 'KOR'
-                }
-                return country_mapping.get(country_name, 'USA')
-        
-        top_10_countries["iso_code"] = top_10_countries["Country"].apply(get_iso_code)
+        # unresolved countries get no location and are left off the map
+        top_10_countries["iso_code"] = top_10_countries["Country"].astype(str).map((data or current()).iso_codes)
         
         color_scale = ["#9BECB2", "#55E77C", "#26E1B2", "#25C488", "#06BE84", "#097759", "#003141", "#002837"]
         
@@ -240,39 +1008,692 @@ def create_world_map():
         print(f"Error creating world map: {e}")
         return go.Figure()
 
-def create_industry_chart():
-    """Create industry distribution chart"""
-    if 'Industry' in df.columns and 'Valuation ($B)' in df.columns:
-        industry_total_val = df.groupby("Industry")["Valuation ($B)"].sum().sort_values(ascending=True)
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            y=industry_total_val.index,
-            x=industry_total_val.values,
-            hovertext=industry_total_val.index,
-            marker=dict(color='#3DED97'),
-            orientation='h'
-        ))
+@metrics.instrument('create_industry_chart')
+def create_industry_chart(filters=None, data=None, offset=0):
+    """Create industry distribution chart
+
+    Past MAX_BARS industries the smallest are folded into an "Other" bar whose
+    customdata is the offset that expands it, every other bar leads back to 0.
+    """
+    if 'Industry' in (data or current()).cube.columns:
+        industry_total_val = rollup("Industry", "valuation", filters, data)
+        if offset >= len(industry_total_val):
+            offset = 0
+        customdata = None
+        if offset or len(industry_total_val) > MAX_BARS:
+            shown = top_k_with_other(industry_total_val, offset=offset)
+            # horizontal bars are drawn bottom-up, keep "Other" at the bottom
+            industry_total_val = pd.concat([
+                shown.loc[shown.index == OTHER_LABEL],
+                shown.drop(OTHER_LABEL, errors='ignore').sort_values(ascending=True)
+            ])
+            customdata = np.where(industry_total_val.index == OTHER_LABEL, offset + MAX_BARS - 1, 0)
+        else:
+            industry_total_val = industry_total_val.sort_values(ascending=True)
         
-        fig.update_layout(
-            title={
-                'text': 'Industries distribution by total valuation',
-                'font': {'family': 'Roboto_font', 'color': 'white', 'size': 26}
+        names = figure_dicts.labels(industry_total_val.index)
+        trace = {
+            'type': 'bar',
+            'y': names,
+            'x': figure_dicts.numbers(industry_total_val.values),
+            'hovertext': names,
+            'marker': {'color': '#3DED97'},
+            'orientation': 'h'
+        }
+        if customdata is not None:
+            trace['customdata'] = customdata
+        return figure_dicts.figure([trace], chart_layout('industry'))
+    else:
+        return go.Figure()
+
+FIGURE_BUILDERS = {
+    'top_investors': create_top_investors_chart,
+    'top_companies': create_top_companies_scatter,
+    'world_map': create_world_map,
+    'industry': create_industry_chart
+}
+
+def register_figure(name, builder):
+    """Register a figure builder, called with a filters dict (or None) and a dataset"""
+    FIGURE_BUILDERS[name] = builder
+    current().figures.pop(name, None)
+
+def get_figure(name, data=None):
+    """Build a registered figure on first use and reuse it for the rest of the snapshot"""
+    data = data or current()
+    fig = data.figures.get(name)
+    if fig is None:
+        fig = FIGURE_BUILDERS[name](None, data)
+        data.figures[name] = fig
+    return fig
+
+def build_figure(name, filters=None, data=None):
+    """Serve the memoized figure when unfiltered, otherwise build it for the filters"""
+    if not filters:
+        return get_figure(name, data)
+    return FIGURE_BUILDERS[name](filters, data or current())
+
+def clear_figures(data=None):
+    """Drop every memoized figure so the next request rebuilds it"""
+    (data or current()).figures.clear()
+
+# set UNICORN_READONLY_CHECKS=1 to verify after each request that no callback modified the snapshot
+READ_ONLY_CHECKS = os.environ.get("UNICORN_READONLY_CHECKS", "") not in ("", "0")
+
+def freeze_frame(frame):
+    """Mark the numpy blocks of frame read-only so in-place writes raise ValueError
+
+    Best effort: it reaches into pandas internals and does not cover Arrow
+    backed columns or inplace=True methods, check_read_only catches those.
+    """
+    for block in getattr(getattr(frame, '_mgr', None), 'blocks', ()):
+        values = getattr(block, 'values', None)
+        if isinstance(values, np.ndarray):
+            values.flags.writeable = False
+    return frame
+
+def frame_layout(frame):
+    """Columns, dtypes and length of frame, to detect added, dropped or replaced columns"""
+    return (tuple(frame.columns), tuple(str(dtype) for dtype in frame.dtypes), len(frame))
+
+def _column_digest(values):
+    try:
+        hashed = pd.util.hash_pandas_object(values, index=False)
+    except TypeError:
+        # Arrow list columns hold arrays, hash their text instead
+        hashed = pd.util.hash_pandas_object(values.astype(str), index=False)
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()
+
+def frame_fingerprint(frame):
+    """frame_layout plus a hash of the index and of every column, in row order"""
+    return (
+        frame_layout(frame),
+        _column_digest(frame.index.to_series()),
+        tuple(_column_digest(frame[col]) for col in frame.columns)
+    )
+
+def check_read_only(data=None):
+    """Raise RuntimeError if a snapshot frame changed since it was published
+
+    The fingerprints hash every value, so sorting in place or writing a
+    single cell is caught too; they are only taken with UNICORN_READONLY_CHECKS=1.
+    """
+    data = data or current()
+    for name, fingerprint in data.fingerprints.items():
+        if frame_fingerprint(getattr(data, name)) != fingerprint:
+            raise RuntimeError(f"Dataset {data.version} was modified in place ({name})")
+
+def country_codes(frame):
+    """ISO-3 code (or None) of every country in frame, from its iso_code column"""
+    if 'Country' not in frame.columns:
+        return {}
+    if 'iso_code' not in frame.columns:
+        return resolve_iso_codes(frame['Country'])
+    pairs = frame[['Country', 'iso_code']].dropna(subset=['Country']).drop_duplicates('Country')
+    return {
+        str(country): None if pd.isna(code) else str(code)
+        for country, code in zip(pairs['Country'], pairs['iso_code'])
+    }
+
+def unresolved_countries(data=None):
+    """Country names of the snapshot that have no ISO-3 code"""
+    return sorted(name for name, code in (data or current()).iso_codes.items() if code is None)
+
+# threads share the snapshot without copying it, see run_builds for what they overlap; UNICORN_BUILD_WORKERS=1 builds serially
+BUILD_WORKERS = int(os.environ.get("UNICORN_BUILD_WORKERS", 0)) or min(4, os.cpu_count() or 1)
+
+def _timed_build(build):
+    start = time.perf_counter()
+    value = build()
+    return value, time.perf_counter() - start
+
+def run_builds(tasks, workers=None):
+    """Run independent build callables on a thread pool, returns (results, seconds) dicts keyed like tasks
+
+    Only the parts of the builds that release the GIL run in parallel: the
+    pandas and numpy aggregation does, the plotly figure assembly (px.scatter,
+    px.choropleth, go.Figure validation) is pure Python and does not, so build
+    time falls with more workers only as far as the aggregation dominates.
+    A failing build is reported and left out of both dicts.
+    """
+    results, timings = {}, {}
+    if not tasks:
+        return results, timings
+    with ThreadPoolExecutor(max_workers=min(workers or BUILD_WORKERS, len(tasks)), thread_name_prefix="figure-build") as pool:
+        futures = {name: pool.submit(_timed_build, build) for name, build in tasks.items()}
+    for name, future in futures.items():
+        try:
+            results[name], timings[name] = future.result()
+        except Exception as e:
+            print(f"Warning: building {name} failed: {e}")
+    return results, timings
+
+def prebuild_figures(data=None, workers=None):
+    """Build every registered figure of a snapshot in parallel, returns seconds per figure"""
+    data = data or current()
+    pending = {
+        name: functools.partial(get_figure, name, data)
+        for name in FIGURE_BUILDERS if name not in data.figures
+    }
+    start = time.perf_counter()
+    _, timings = run_builds(pending, workers)
+    if timings:
+        detail = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+        print(f"Built {len(timings)} figures in {time.perf_counter() - start:.2f}s ({detail})")
+    return timings
+
+class Dataset:
+    """Snapshot of the cleaned data and everything derived from it
+
+    A snapshot is never modified once published; reloads and updates build a
+    new one and swap it in, so a callback holding one keeps a consistent view.
+    """
+
+    def __init__(self, df, version, cube=None, investor_index=None, row_index=None, chunked=False, revision=0,
+                 timeline_cube=None, iso_codes=None, timeline_marginals=None):
+        self.df = df
+        self.version = version
+        self.chunked = chunked
+        # number of updates_path records applied on top of the CSV
+        self.revision = revision
+        self.cube = build_cube(df) if cube is None else cube
+        self.investor_index = build_investor_index(df) if investor_index is None else investor_index
+        self.row_index = build_row_index(df) if row_index is None else row_index
+        # chunked snapshots keep join months per dimension value instead, see ingest_chunked
+        self.timeline_marginals = timeline_marginals
+        self.timeline_cube = build_timeline_cube(df) if timeline_cube is None and not chunked else timeline_cube
+        self.iso_codes = country_codes(df) if iso_codes is None else iso_codes
+        self.year_bounds = compute_year_bounds(self.cube)
+        self.totals = kpi_totals(data=self)
+        self.figures = {}
+        self.search = None
+        # Timeline per filter selection, see timeline_for
+        self.timelines = {}
+        # compact unfiltered dropdown and hover results, filled by precompute_variants
+        self.variants = {'industry_years': {}, 'country_investors': {}}
+        # callbacks share this snapshot, writes into it must fail instead of leaking to other requests
+        freeze_frame(self.df)
+        freeze_frame(self.cube)
+        if self.timeline_cube is not None:
+            freeze_frame(self.timeline_cube)
+        for table in (self.timeline_marginals or {}).values():
+            freeze_frame(table)
+        self.fingerprints = {}
+        if READ_ONLY_CHECKS:
+            self.fingerprints = {
+                name: frame_fingerprint(frame)
+                for name, frame in (('df', self.df), ('cube', self.cube), ('timeline_cube', self.timeline_cube))
+                if frame is not None
             }
+
+def load_snapshot(path=SOURCE_CSV):
+    """Read, clean and index the source CSV into a new Dataset"""
+    version = source_key(path)
+    if INGEST_CHUNKSIZE:
+        ingested = ingest_chunked(path, INGEST_CHUNKSIZE)
+        top_rows = compact_frame(ingested['top_rows']) if COMPACT_SCHEMA else ingested['top_rows']
+        return Dataset(
+            top_rows,
+            version,
+            cube=ingested['cube'],
+            investor_index=investor_index_from_marginals(ingested['investor_marginals']),
+            chunked=True,
+            timeline_marginals=ingested['timeline_marginals']
+        )
+    frame = load_dataset(path)
+    if COMPACT_SCHEMA:
+        compact = compact_frame(frame)
+        report = memory_report(frame, compact)
+        print(f"Compact schema: {report.at['total', 'before'] / 1e6:.1f} MB -> {report.at['total', 'after'] / 1e6:.1f} MB")
+        frame = compact
+    return Dataset(frame, version)
+
+try:
+    _active = load_snapshot(SOURCE_CSV)
+except FileNotFoundError:
+    print("Warning: Unicorn_Companies.csv not found. Creating dummy data.")
+    _active = Dataset(clean_frame(dummy_frame()), "dummy")
+
+# serializes snapshot swaps from reloads and incremental updates
+_update_lock = threading.Lock()
+
+def current():
+    """The dataset snapshot callbacks should read from"""
+    return _active
+
+def publish(data):
+    """Atomically make data the current snapshot"""
+    global _active
+    _active = data
+    return data
+
+# UNICORN_WARM_VARIANTS=1 precomputes every dropdown and hover variant within UNICORN_WARM_MAX_BYTES
+WARM_VARIANTS = os.environ.get("UNICORN_WARM_VARIANTS", "") not in ("", "0")
+WARM_MAX_BYTES = int(os.environ.get("UNICORN_WARM_MAX_BYTES", 32 * 2**20))
+WARM_TOP_N = 10
+
+def _variant_bytes(labels, counts):
+    if labels.dtype == object:
+        return counts.nbytes + sum(len(str(label)) + 8 for label in labels)
+    return labels.nbytes + counts.nbytes
+
+def precompute_variants(data=None, max_bytes=None):
+    """Store founded-year counts per industry and top investors per country, largest first
+
+    Variants are kept as small numpy arrays; once max_bytes is used up the
+    remaining (smaller) industries and countries are computed on demand.
+    """
+    data = data or current()
+    max_bytes = max_bytes or WARM_MAX_BYTES
+    candidates = []
+    for kind, col in (('industry_years', 'Industry'), ('country_investors', 'Country')):
+        if col in data.cube.columns:
+            sizes = data.cube.groupby(col, observed=True)['count'].sum()
+            candidates.extend((int(rows), kind, value) for value, rows in sizes.items())
+    candidates.sort(key=lambda candidate: -candidate[0])
+
+    variants = {'industry_years': {}, 'country_investors': {}}
+    used = skipped = 0
+    for _, kind, value in candidates:
+        if kind == 'industry_years':
+            series = founded_year_counts(value, data=data)
+            labels = series.index.to_numpy(dtype='int16')
+        else:
+            series = top_investors(value, n=WARM_TOP_N, data=data)
+            labels = series.index.to_numpy(dtype=object)
+        counts = series.to_numpy(dtype='int32')
+        size = _variant_bytes(labels, counts)
+        if used + size > max_bytes:
+            skipped += 1
+            continue
+        variants[kind][value] = (labels, counts)
+        used += size
+    data.variants = variants
+    print(
+        f"Precomputed {len(variants['industry_years'])} industry and {len(variants['country_investors'])} "
+        f"country variants in {used / 1024:.1f} KiB" + (f", {skipped} over the memory cap" if skipped else "")
+    )
+    return used
+
+def search_index(data=None):
+    """The company/investor/city SearchIndex of a snapshot, built on first use
+
+    Investors come from the investor counts and so are complete, companies
+    and cities only from data.df; in chunked mode that is the top rows kept
+    per dimension value, so a company outside them cannot be found by name.
+    """
+    data = data or current()
+    if data.search is None:
+        investor_counts = data.investor_index.get('all')
+        data.search = search.build_search_index(data.df, investor_counts)
+    return data.search
+
+def search_names(text, limit=10, data=None):
+    """Ranked typeahead matches for text as (kind, label, row) tuples"""
+    return search_index(data).query(text, limit)
+
+def search_target(kind, label, row=-1, data=None):
+    """What to highlight in the charts for a search result
+
+    A company highlights itself, its country and its industry, a city its
+    country, an investor its own bars.
+    """
+    data = data or current()
+    target = {'kind': kind, 'label': label}
+    if kind == 'Company' and 0 <= row < len(data.df):
+        company = data.df.iloc[row]
+        if company['Company'] == label:
+            for col in ['Country', 'Industry', 'Valuation ($B)', 'Total Raised(M)']:
+                if col in data.df.columns and pd.notna(company[col]):
+                    target[col] = company[col].item() if hasattr(company[col], 'item') else company[col]
+            target['iso_code'] = data.iso_codes.get(str(company['Country']))
+    elif kind == 'City' and 'City' in data.df.columns:
+        countries = data.df.loc[data.df['City'] == label, 'Country']
+        if len(countries):
+            target['Country'] = str(countries.mode().iloc[0])
+            target['iso_code'] = data.iso_codes.get(target['Country'])
+    elif kind == 'Investor':
+        target['Investor'] = label
+    return target
+
+# filter selections whose Timeline is kept per snapshot, the unfiltered one is built on warm-up
+TIMELINE_CACHE = 64
+
+@metrics.timed('aggregate')
+def timeline_for(filters=None, data=None):
+    """Cumulative join-month Timeline of the companies matching filters, built once per snapshot"""
+    data = data or current()
+    key = tuple(filters.items()) if filters else None
+    found = data.timelines.get(key)
+    if found is None:
+        if data.timeline_cube is not None:
+            cells = filter_cells(data.timeline_cube, filters)
+        elif data.timeline_marginals is not None:
+            cells = marginal_cells(data.timeline_marginals, filters, data.cube)
+        else:
+            cells = None
+        found = timeline.build_timeline(cells)
+        if len(data.timelines) >= TIMELINE_CACHE:
+            data.timelines.pop(next(iter(data.timelines)), None)
+        data.timelines[key] = found
+    return found
+
+# callables run on a snapshot before it serves requests, see warm_snapshot
+WARMERS = [search_index, functools.partial(timeline_for, None)]
+if os.environ.get("UNICORN_PREBUILD", "1") not in ("", "0"):
+    WARMERS.append(prebuild_figures)
+if WARM_VARIANTS:
+    WARMERS.append(precompute_variants)
+
+def register_warmer(warmer):
+    """Run warmer(data) on every snapshot before it is published by a reload"""
+    WARMERS.append(warmer)
+
+def warm_snapshot(data=None):
+    """Run the registered warmers on a snapshot, the current one by default"""
+    data = data or current()
+    for warmer in WARMERS:
+        try:
+            warmer(data)
+        except Exception as e:
+            print(f"Warning: warming dataset {data.version} failed: {e}")
+    return data
+
+def reload_if_changed(path=SOURCE_CSV):
+    """Rebuild, warm and publish a snapshot when the source CSV changed, returns True if it did"""
+    try:
+        if source_key(path) == current().version.split('+')[0]:
+            return sync_updates()
+        data = warm_snapshot(load_snapshot(path))
+    except FileNotFoundError:
+        return False
+    with _update_lock:
+        publish(data)
+    return True
+
+def start_reloader(interval=10, path=SOURCE_CSV):
+    """Poll the source CSV in a daemon thread and hot-swap the dataset when it changes
+
+    Rows posted through apply_update are dropped by a reload, the CSV is the source of truth.
+    """
+    def poll():
+        while True:
+            time.sleep(interval)
+            try:
+                if reload_if_changed(path):
+                    print(f"Reloaded {path}, dataset version {current().version}")
+            except Exception as e:
+                print(f"Warning: reloading {path} failed: {e}")
+
+    thread = threading.Thread(target=poll, name="dataset-reloader", daemon=True)
+    thread.start()
+    return thread
+
+def industries(data=None):
+    """Industries in order of first appearance, as offered by the industry dropdown"""
+    cube = (data or current()).cube
+    return cube['Industry'].dropna().unique().tolist() if 'Industry' in cube.columns else []
+
+def _ranked_codes(codes, names):
+    # value_counts of the named codes: ties rank by first appearance, as in build_investor_index
+    present = pd.unique(codes)
+    counts = pd.Series(np.bincount(codes, minlength=len(names))[present], index=names[present], name='count')
+    return counts.rename_axis('Investor').sort_values(ascending=False, kind='stable')
+
+def _negated(cells):
+    measures = [col for col in ('count', 'valuation', 'raised') if col in cells.columns]
+    return cells.assign(**{col: -cells[col] for col in measures})
+
+def fold_cells(table, added, removed=None):
+    """Add and subtract cell aggregates, dropping cells left empty"""
+    parts = [table, added]
+    if removed is not None and len(removed):
+        parts.append(_negated(removed))
+    merged = merge_cubes(parts)
+    return merged[merged['count'] > 0].reset_index(drop=True)
+
+def fold_timeline(table, added, removed=None):
+    """fold_cells for the timeline cube, which is None when the data has no join dates"""
+    if table is None or added is None:
+        return table
+    return fold_cells(table, added, removed)
+
+def _shift_row_index(index, keep, position, new_rows, offset):
+    """Remap row positions after dropping rows and append positions for new_rows"""
+    shifted = {}
+    for col in FILTER_COLUMNS:
+        if col not in index:
+            continue
+        lookup = {}
+        for value, positions in index[col].items():
+            positions = position[positions[keep[positions]]]
+            if len(positions):
+                lookup[value] = positions
+        codes, values = pd.factorize(new_rows[col])
+        for i, value in enumerate(values):
+            added = np.flatnonzero(codes == i) + offset
+            lookup[value] = np.concatenate([lookup[value], added]) if value in lookup else added
+        shifted[col] = lookup
+    if 'Founded Year' in index:
+        years, order = index['Founded Year']
+        kept = keep[order]
+        years, order = years[kept], position[order[kept]]
+        new_years = new_rows['Founded Year'].to_numpy(dtype=float, na_value=np.nan)
+        new_order = np.argsort(new_years, kind='stable')
+        at = np.searchsorted(years, new_years[new_order], side='right')
+        shifted['Founded Year'] = (np.insert(years, at, new_years[new_order]), np.insert(order, at, new_order + offset))
+    return shifted
+
+def _shift_investor_index(index, keep, position, replaced_rows, new_rows, offset):
+    """Remap the investor pairs past replaced_rows, append those of new_rows and recount
+
+    Counts are taken from the integer codes, so ties keep the first-appearance
+    order a fresh build_investor_index gives; only the countries of the
+    replaced and new rows are recounted.
+    """
+    pairs, codes, names = index['pairs'], index['codes'], index['names']
+    rows = pairs['row'].to_numpy()
+    kept = keep[rows]
+    removed_pairs = pairs[~kept]
+    fresh = build_investor_index(new_rows)
+    fresh_pairs = fresh['pairs'].assign(row=fresh['pairs']['row'] + offset)
+
+    new_names = pd.Index(fresh_pairs['Investor'].unique()).difference(names)
+    names = names.append(new_names)
+
+    pairs = concat_rows([pairs[kept].assign(row=position[rows[kept]]), fresh_pairs], ignore_index=True)
+    codes = np.concatenate([codes[kept], names.get_indexer(fresh_pairs['Investor'])])
+
+    by_country = dict(index['by_country'])
+    if 'Country' in pairs.columns:
+        changed = set(removed_pairs['Country'].dropna()) | set(fresh['by_country'])
+        for country in changed:
+            counts = _ranked_codes(codes[(pairs['Country'] == country).to_numpy()], names)
+            if len(counts):
+                by_country[country] = counts
+            else:
+                by_country.pop(country, None)
+
+    return {
+        'pairs': pairs,
+        'all': _ranked_codes(codes, names),
+        'by_country': by_country,
+        'codes': codes,
+        'names': names,
+        **investor_incidence(codes, pairs['row'].to_numpy(), len(names), offset + len(new_rows))
+    }
+
+def update_version(version, records):
+    """Dataset version after applying records, the same in every worker that applied the same updates"""
+    digest = hashlib.sha1((version + json.dumps(records, sort_keys=True, default=str)).encode()).hexdigest()[:12]
+    return f"{version.split('+')[0]}+{digest}"
+
+def updates_path(version):
+    """Log of the rows posted on top of a CSV version, one JSON list of records per line"""
+    return os.path.join(CACHE_DIR, f"updates-{version.split('+')[0]}.jsonl")
+
+@contextlib.contextmanager
+def _locked_log(path):
+    # every worker appends to and replays from the same file, one at a time
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a+', encoding='utf-8') as log:
+        if fcntl is not None:
+            fcntl.flock(log, fcntl.LOCK_EX)
+        try:
+            yield log
+        finally:
+            if fcntl is not None:
+                fcntl.flock(log, fcntl.LOCK_UN)
+
+def _logged_updates(log, applied):
+    # a line without its newline is a write still in progress
+    log.seek(0)
+    return [json.loads(line) for line in log.read().split('\n')[:-1][applied:]]
+
+def _apply_records(data, records):
+    """New Dataset with records folded into data, see apply_update"""
+    df = data.df
+    raw = pd.DataFrame.from_records(records)
+    companies = raw['Company'] if 'Company' in raw.columns else pd.Series([None])
+    # a nameless row would still count as a unicorn
+    if companies.isna().any() or (companies.astype(str).str.strip() == '').any():
+        raise ValueError("every row needs a Company")
+    unknown = [col for col in raw.columns if col not in RAW_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown columns {unknown}, rows use the columns of {SOURCE_CSV}")
+    # missing columns become empty values, cleaned like empty cells of the CSV
+    raw = raw.drop_duplicates('Company', keep='last').reset_index(drop=True).reindex(columns=RAW_COLUMNS)
+    # posted rows are well formed, an empty investor list is not a shifted row
+    new_rows = clean_frame(raw, repair_shift=False).reindex(columns=df.columns)
+    # an all-empty text column is cleaned to floats, keep the snapshot's text dtypes
+    new_rows = new_rows.astype({
+        col: df[col].dtype for col in df.columns
+        if df[col].dtype in (object, 'str') and new_rows[col].dtype != df[col].dtype
+    })
+    if COMPACT_SCHEMA:
+        new_rows = compact_frame(new_rows)
+    revision = data.revision + 1
+    version = update_version(data.version, records)
+    iso_codes = {**data.iso_codes, **country_codes(new_rows)}
+
+    if data.chunked:
+        # top rows keep their file labels, number the new ones after them
+        new_rows.index = new_rows.index + (int(df.index.max()) + 1 if len(df) else 0)
+        updated = Dataset(
+            keep_top_rows(concat_rows([df, new_rows])),
+            version,
+            cube=fold_cells(data.cube, build_cube(new_rows)),
+            investor_index=investor_index_from_marginals(
+                fold_marginals(data.investor_index['marginals'], build_investor_marginals(new_rows))
+            ),
+            chunked=True,
+            revision=revision,
+            iso_codes=iso_codes,
+            timeline_marginals=fold_marginals(data.timeline_marginals, build_timeline_marginals(new_rows))
         )
-        fig.update_layout(layout_config)
-        return fig
     else:
-        return go.Figure()
+        replaced = df['Company'].isin(new_rows['Company']).to_numpy()
+        keep = ~replaced
+        position = np.cumsum(keep) - 1
+        offset = int(keep.sum())
+        updated = Dataset(
+            concat_rows([df[keep], new_rows], ignore_index=True),
+            version,
+            cube=fold_cells(data.cube, build_cube(new_rows), build_cube(df[replaced])),
+            investor_index=_shift_investor_index(data.investor_index, keep, position, df[replaced], new_rows, offset),
+            row_index=_shift_row_index(data.row_index, keep, position, new_rows, offset),
+            revision=revision,
+            timeline_cube=fold_timeline(data.timeline_cube, build_timeline_cube(new_rows), build_timeline_cube(df[replaced])),
+            iso_codes=iso_codes
+        )
+    return updated
+
+def _publish_update(data, warm=True):
+    # warmers run outside _update_lock so reads and other updates are not held up
+    # by them; a snapshot that a reload or a later update overtook meanwhile is dropped
+    if warm:
+        warm_snapshot(data)
+    with _update_lock:
+        latest = current()
+        if latest.version.split('+')[0] == data.version.split('+')[0] and latest.revision < data.revision:
+            publish(data)
+
+def sync_updates(warm=True):
+    """Apply the rows other workers posted since this one last looked, returns True if there were any
+
+    The caught-up snapshot is warmed before it is published unless warm is False.
+    """
+    path = updates_path(current().version)
+    if not os.path.exists(path):
+        return False
+    with _update_lock, _locked_log(path) as log:
+        data = current()
+        pending = _logged_updates(log, data.revision)
+        for records in pending:
+            data = _apply_records(data, records)
+    if pending:
+        _publish_update(data, warm)
+    return bool(pending)
+
+def apply_update(records):
+    """Clean new or changed rows and publish a snapshot with them folded in
+
+    records use the raw CSV columns (RAW_COLUMNS), any of them but Company may
+    be left out. A record whose Company is already loaded replaces that
+    company's row; in chunked mode records are always appended. Only the
+    records are cleaned, exploded and resolved to ISO codes.
+
+    The cost is not fully proportional to the delta: the new snapshot still
+    copies the frame, regroups the cubes (fold_cells) and rebuilds the
+    investor incidence and row positions as whole arrays, so one update
+    takes about 0.4s on a million rows while holding _update_lock. The
+    new snapshot then runs the WARMERS like a reload does, so its figures,
+    search index and variants are ready before it is published. Post rows
+    in batches rather than one request per company.
+
+    Accepted records are appended to the updates_path log of the CSV version,
+    which the other workers replay through sync_updates, and the version is
+    a hash of the updates applied so every worker names the same data alike.
+    Returns the new dataset version.
+    """
+    with _update_lock, _locked_log(updates_path(current().version)) as log:
+        data = current()
+        for pending in _logged_updates(log, data.revision):
+            data = _apply_records(data, pending)
+        updated = _apply_records(data, records)
+        log.write(json.dumps(records, default=str) + '\n')
+        log.flush()
+    _publish_update(updated)
+    return updated.version
 
-fig2 = create_top_investors_chart()
-fig3 = create_top_companies_scatter()
-fig4 = create_world_map()
-fig5 = create_industry_chart()
+# replay rows posted to other workers since the CSV was loaded, the app warms the snapshot on startup
+sync_updates(warm=False)
 
-total_valuation = math.ceil(df['Valuation ($B)'].sum() * 10**-3) if len(df) > 0 else 0
-total_number_unicorn = df['Company'].count() if 'Company' in df.columns else 0
-total_funding = round(df["Total Raised(M)"].sum() * 10**-3, 2) if 'Total Raised(M)' in df.columns else 0
+# the old module globals now read from the current snapshot
+_legacy_figures = {
+    'fig2': 'top_investors',
+    'fig3': 'top_companies',
+    'fig4': 'world_map',
+    'fig5': 'industry'
+}
+_snapshot_attributes = {
+    'df': lambda data: data.df,
+    'cube': lambda data: data.cube,
+    'investor_index': lambda data: data.investor_index,
+    'row_index': lambda data: data.row_index,
+    'year_bounds': lambda data: data.year_bounds,
+    'dataset_version': lambda data: data.version,
+    'total_valuation': lambda data: data.totals[0],
+    'total_number_unicorn': lambda data: data.totals[1],
+    'total_funding': lambda data: data.totals[2],
+    'toatl_number_unicorn': lambda data: data.totals[1],
+    'toatl_funding': lambda data: data.totals[2]
+}
 
-toatl_number_unicorn = total_number_unicorn
-toatl_funding = total_funding  
\ No newline at end of file
+def __getattr__(name):
+    if name in _legacy_figures:
+        fig = get_figure(_legacy_figures[name])
+        return go.Figure(fig) if isinstance(fig, dict) else fig
+    if name in _snapshot_attributes:
+        return _snapshot_attributes[name](current())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")